@@ -0,0 +1,366 @@
+import cvxpy as cp
+import numpy as np
+import scipy.sparse
+
+import concurrent.futures
+
+from solver.classes import MixedIntegerProblem
+
+
+def _window_matrix(lengths, n_periods) -> scipy.sparse.csr_matrix:
+    """Sparse (J*T, J*T) matrix whose row (j, t) sums the entries t to
+    t + lengths[j] - 1 (cut at the horizon) of row j of a row-major
+    flattened (J, T) array.
+    """
+    n_units = len(lengths)
+    unit, period = np.divmod(np.arange(n_units * n_periods), n_periods)
+    rows, cols = [], []
+    for k in range(int(np.max(lengths, initial=1))):
+        inside = (k < lengths[unit]) & (period + k < n_periods)
+        rows.append(np.flatnonzero(inside))
+        cols.append(np.flatnonzero(inside) + k)
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    return scipy.sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)),
+        shape=(n_units * n_periods, n_units * n_periods))
+
+
+class UnitCommitmentProblem():
+    """Commit and dispatch J generating units over T periods at minimum
+    cost, as in the unit commitment notebook (MIP-3).
+
+    `cost`, `startup_cost`, `p_min` and `p_max` hold one value per unit
+    and `demand` one value per period; they become the cp.Parameters of
+    the same names. A unit that is on produces between p_min and p_max,
+    the units together meet the demand of every period, and a unit
+    switched on (off) stays on (off) for at least `up_time` (`down_time`)
+    periods or until the end of the horizon. `initial_state` is 1 for the
+    units that are on before the first period.
+
+    problem() builds the MIP over the (J, T) variables `p` (output), `u`
+    (on/off), `alpha` (start-up) and `beta` (shut-down). solve() solves
+    it as one MIP or, with method='lagrangian', by Lagrangian relaxation
+    of the demand constraints (see lagrangian_unit_commitment). Either way
+    the variables hold the schedule afterwards and `status`, `value` and
+    `lower_bound` the result.
+    """
+    def __init__(self, cost, startup_cost, p_min, p_max, demand,
+                 up_time=1, down_time=1, initial_state=0):
+        cost = np.asarray(cost, dtype=float)
+        if cost.ndim != 1:
+            raise ValueError('Expected one cost per unit.')
+        n_units = len(cost)
+        demand = np.asarray(demand, dtype=float)
+        if demand.ndim != 1:
+            raise ValueError('Expected one demand per period.')
+        n_periods = len(demand)
+
+        def per_unit(values, dtype=float):
+            return np.broadcast_to(
+                np.asarray(values, dtype=dtype), (n_units,)).copy()
+
+        self.cost = cp.Parameter(n_units, name='cost', value=cost)
+        self.startup_cost = cp.Parameter(
+            n_units, name='startup_cost', value=per_unit(startup_cost))
+        self.p_min = cp.Parameter(
+            n_units, name='p_min', value=per_unit(p_min))
+        self.p_max = cp.Parameter(
+            n_units, name='p_max', value=per_unit(p_max))
+        self.demand = cp.Parameter(n_periods, name='demand', value=demand)
+        self.up_time = per_unit(up_time, int)
+        self.down_time = per_unit(down_time, int)
+        self.initial_state = per_unit(initial_state, int)
+        if (self.up_time < 1).any() or (self.down_time < 1).any():
+            raise ValueError('Up and down times must be at least 1.')
+
+        self.p = cp.Variable((n_units, n_periods), nonneg=True, name='p')
+        self.u = cp.Variable((n_units, n_periods), boolean=True, name='u')
+        self.alpha = cp.Variable(
+            (n_units, n_periods), boolean=True, name='alpha')
+        self.beta = cp.Variable(
+            (n_units, n_periods), boolean=True, name='beta')
+        self._problem = None
+
+        self.status = None
+        self.value = None
+        self.lower_bound = None
+
+    @property
+    def shape(self) -> tuple:
+        return self.p.shape
+
+    def problem(self) -> MixedIntegerProblem:
+        """Return the (cached) MIP of the unit commitment."""
+        if self._problem is not None:
+            return self._problem
+
+        n_units, n_periods = self.shape
+        p, u, alpha, beta = self.p, self.u, self.alpha, self.beta
+        p_min = cp.reshape(self.p_min, (n_units, 1), order='C')
+        p_max = cp.reshape(self.p_max, (n_units, 1), order='C')
+        # u shifted by one period, starting from the initial state
+        first = np.zeros((n_units, n_periods))
+        first[:, 0] = self.initial_state
+        previous = u @ np.eye(n_periods, k=1) + first
+
+        # min up (down) time windows, cut at the horizon
+        up = _window_matrix(self.up_time, n_periods)
+        down = _window_matrix(self.down_time, n_periods)
+        up_length = np.asarray(up.sum(axis=1)).ravel()
+        down_length = np.asarray(down.sum(axis=1)).ravel()
+        u_vec = cp.vec(u, order='C')
+
+        objective = cp.Minimize(
+            cp.sum(self.cost @ p) + cp.sum(self.startup_cost @ alpha))
+        constraints = [
+            # output range
+            p >= cp.multiply(p_min, u),
+            p <= cp.multiply(p_max, u),
+            # demand
+            cp.sum(p, axis=0) >= self.demand,
+            # logical
+            previous - u + alpha - beta == 0,
+            alpha + beta <= 1,
+            # up-time and down-time
+            up @ u_vec >= cp.multiply(up_length, cp.vec(alpha, order='C')),
+            down_length - down @ u_vec >= cp.multiply(
+                down_length, cp.vec(beta, order='C')),
+        ]
+        self._problem = MixedIntegerProblem(objective, constraints)
+        return self._problem
+
+    def set_schedule(self, commitment, output):
+        """Assign an on/off schedule and outputs to the variables."""
+        commitment = np.asarray(commitment, dtype=float)
+        previous = np.column_stack([self.initial_state, commitment[:, :-1]])
+        self.u.value = commitment
+        self.p.value = np.asarray(output, dtype=float)
+        self.alpha.value = np.maximum(commitment - previous, 0)
+        self.beta.value = np.maximum(previous - commitment, 0)
+
+    def solve(self, method='mip', **kwargs) -> dict:
+        """Solve as one MIP (method='mip', kwargs go to cvxpy's solve) or
+        by Lagrangian relaxation (method='lagrangian', kwargs go to
+        lagrangian_unit_commitment).
+        """
+        if method == 'lagrangian':
+            result = lagrangian_unit_commitment(self, **kwargs)
+        elif method == 'mip':
+            prob = self.problem()
+            prob.solve(**kwargs)
+            result = {'status': prob.status,
+                      'optimal_value': prob.value,
+                      'lower_bound': prob.value}
+        else:
+            raise ValueError('Unknown method: {}'.format(method))
+        self.status = result['status']
+        self.value = result['optimal_value']
+        self.lower_bound = result['lower_bound']
+        return result
+
+
+def _commit_units(net_cost, startup_cost, p_min, p_max, up_time,
+                  down_time, initial_state) -> tuple:
+    """Cheapest on/off schedule of each unit on its own, by dynamic
+    programming over the states (on or off, periods in that state capped
+    at the up or down time), vectorized across the units.
+
+    `net_cost` is the (J, T) cost of a unit of output, which is p_max if
+    negative and p_min otherwise while the unit is on. Returns the cost,
+    the (J, T) commitment and the (J, T) output of each unit.
+    """
+    n_units, n_periods = net_cost.shape
+    units = np.arange(n_units)
+    level = np.where(net_cost < 0, p_max[:, None], p_min[:, None])
+    on_cost = net_cost * level
+
+    # state k of a unit holds its k+1 last periods on (off), the last
+    # state (cap) any longer stretch
+    caps = (up_time - 1, down_time - 1)
+    n_states = (int(up_time.max()), int(down_time.max()))
+    invalid = [np.arange(n)[None, :] > cap[:, None]
+               for n, cap in zip(n_states, caps)]
+    values = [np.full((n_units, n), np.inf) for n in n_states]
+    values[0][units, caps[0]] = np.where(initial_state == 1, 0, np.inf)
+    values[1][units, caps[1]] = np.where(initial_state == 1, np.inf, 0)
+    # how each state was reached: 0 from the previous state, 1 staying in
+    # the cap state, 2 switching from the cap state of the other kind
+    choices = [np.zeros((n_periods, n_units, n), dtype=np.int8)
+               for n in n_states]
+
+    for t in range(n_periods):
+        switch = (values[1][units, caps[1]] + startup_cost,
+                  values[0][units, caps[0]])
+        new_values = []
+        for kind in (0, 1):
+            value = np.full_like(values[kind], np.inf)
+            choice = choices[kind][t]
+            value[:, 1:] = values[kind][:, :-1]
+            stay = values[kind][units, caps[kind]]
+            better = stay < value[units, caps[kind]]
+            value[units[better], caps[kind][better]] = stay[better]
+            choice[units[better], caps[kind][better]] = 1
+            better = switch[kind] < value[:, 0]
+            value[better, 0] = switch[kind][better]
+            choice[better, 0] = 2
+            value[invalid[kind]] = np.inf
+            if kind == 0:
+                value += on_cost[:, t, None]
+            new_values.append(value)
+        values = new_values
+
+    best = [v.min(axis=1) for v in values]
+    kind = np.where(best[0] <= best[1], 0, 1)
+    state = np.where(kind == 0, values[0].argmin(axis=1),
+                     values[1].argmin(axis=1))
+    commitment = np.zeros((n_units, n_periods))
+    for t in range(n_periods - 1, -1, -1):
+        commitment[:, t] = kind == 0
+        choice = np.where(
+            kind == 0,
+            choices[0][t, units, np.minimum(state, n_states[0] - 1)],
+            choices[1][t, units, np.minimum(state, n_states[1] - 1)])
+        other = 1 - kind
+        state = np.where(choice == 0, state - 1,
+                         np.where(choice == 1, np.choose(kind, caps),
+                                  np.choose(other, caps)))
+        kind = np.where(choice == 2, other, kind)
+
+    return (np.minimum(best[0], best[1]), commitment,
+            commitment * level)
+
+
+def _commit_units_in_chunks(executor, chunks, net_cost, data) -> tuple:
+    if executor is None:
+        return _commit_units(net_cost, *data)
+    results = list(executor.map(
+        _commit_units, *zip(*[[net_cost[c]] + [x[c] for x in data]
+                              for c in chunks])))
+    return tuple(np.concatenate([r[i] for r in results])
+                 for i in range(3))
+
+
+def _dispatch(commitment, cost, p_min, p_max, demand) -> np.ndarray:
+    """Cheapest outputs of the committed units meeting the demand of each
+    period (merit order above the minimum outputs).
+    """
+    output = p_min[:, None] * commitment
+    headroom = ((p_max - p_min)[:, None] * commitment)
+    order = np.argsort(cost, kind='stable')
+    residual = np.maximum(demand - output.sum(axis=0), 0)
+    before = np.cumsum(headroom[order], axis=0) - headroom[order]
+    output[order] += np.clip(residual - before, 0, headroom[order])
+    return output
+
+
+def lagrangian_unit_commitment(prob: UnitCommitmentProblem,
+                               max_iterations=200, tolerance=1e-3,
+                               step=2., workers=1) -> dict:
+    """Solve a unit commitment by Lagrangian relaxation of the demand.
+
+    With multipliers (prices) on the demand constraints the problem splits
+    into independent per-unit subproblems, solved exactly by dynamic
+    programming over the on/off states (in a process pool of `workers`
+    if > 1). Their total cost is a lower bound. The prices follow
+    subgradient steps of size `step` * (best cost - bound) / |s|^2 on the
+    unmet demand s, `step` being halved when the bound stalls. Feasible
+    schedules come from raising the prices of the periods short of
+    capacity until enough units are committed, followed by a merit order
+    dispatch.
+
+    Stops once the relative gap between the best schedule and the bound
+    is below `tolerance` (status 'optimal') or after max_iterations
+    (status 'feasible'). The best schedule is assigned to the problem's
+    variables. Returns a dict with 'status', 'optimal_value' (cost of the
+    best schedule), 'lower_bound', 'gap', 'multipliers' and 'iterations'.
+    """
+    cost = prob.cost.value
+    startup_cost = prob.startup_cost.value
+    p_min, p_max = prob.p_min.value, prob.p_max.value
+    demand = prob.demand.value
+    data = (startup_cost, p_min, p_max, prob.up_time, prob.down_time,
+            prob.initial_state)
+    result = {'status': None,
+              'optimal_value': None,
+              'lower_bound': None,
+              'gap': None,
+              'multipliers': None,
+              'iterations': 0}
+    if (demand > p_max.sum()).any():
+        result['status'] = 'infeasible'
+        return result
+
+    def schedule_cost(commitment, output):
+        previous = np.column_stack([prob.initial_state, commitment[:, :-1]])
+        startups = np.maximum(commitment - previous, 0)
+        return (cost @ output).sum() + (startup_cost @ startups).sum()
+
+    # start from the marginal cost of a merit order stack at full output
+    order = np.argsort(cost, kind='stable')
+    marginal = np.searchsorted(np.cumsum(p_max[order]), demand)
+    prices = cost[order][np.minimum(marginal, len(cost) - 1)]
+    price_step = 0.05 * max(np.abs(cost).max(), 1.)
+
+    workers = min(workers, len(cost))
+    chunks = np.array_split(np.arange(len(cost)), workers)
+    executor = None
+    if workers > 1:
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers)
+
+    best_value, best_schedule = np.inf, None
+    lower_bound, stalled = -np.inf, 0
+    try:
+        for iteration in range(1, max_iterations + 1):
+            result['iterations'] = iteration
+            values, commitment, output = _commit_units_in_chunks(
+                executor, chunks, cost[:, None] - prices, data)
+            bound = values.sum() + prices @ demand
+            if bound > lower_bound + 1e-9 * abs(bound):
+                lower_bound, stalled = bound, 0
+            else:
+                stalled += 1
+                if stalled >= 5:
+                    step, stalled = step / 2, 0
+
+            # raise the prices where the committed capacity falls short
+            repair_prices, repair = prices.copy(), commitment
+            for k in range(60):
+                short = (p_max @ repair) < demand
+                if not short.any():
+                    break
+                repair_prices[short] += price_step * 2 ** k
+                _, repair, _ = _commit_units_in_chunks(
+                    executor, chunks, cost[:, None] - repair_prices, data)
+            if not ((p_max @ repair) < demand).any():
+                dispatch = _dispatch(repair, cost, p_min, p_max, demand)
+                value = schedule_cost(repair, dispatch)
+                if value < best_value:
+                    best_value, best_schedule = value, (repair, dispatch)
+
+            gap = (best_value - lower_bound) / max(abs(best_value), 1.)
+            if gap <= tolerance:
+                break
+            subgradient = demand - output.sum(axis=0)
+            norm = subgradient @ subgradient
+            if norm == 0:
+                break
+            target = best_value if np.isfinite(best_value) else (
+                1.05 * abs(bound) + 1.)
+            prices = np.maximum(
+                prices + step * (target - bound) / norm * subgradient, 0)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    result['lower_bound'] = lower_bound
+    result['multipliers'] = prices
+    if best_schedule is None:
+        result['status'] = 'infeasible_inaccurate'
+        return result
+    result['optimal_value'] = best_value
+    result['gap'] = (best_value - lower_bound) / max(abs(best_value), 1.)
+    result['status'] = 'optimal' if result['gap'] <= tolerance \
+        else 'feasible'
+    prob.set_schedule(*best_schedule)
+    return result
@@ -1,192 +1,2501 @@
+import cvxpy as cp
 import numpy as np
+import scipy.linalg
 
+import collections
+import concurrent.futures
+import heapq
+import itertools
 import logging
+import time
 
-from solver.classes import AssignmentProblem, BinaryIntegerProblem, Graph
+from solver.classes import AssignmentProblem, IntegerProblem
+from solver.classes import CSRGraph, Edge, Graph, LinearRelaxation
 from solver.classes import TransportationProblem
-from solver.utils import is_integer_solution
 
-z_star = -np.inf
-var_index = 0
 tolerance = 1e-7
 
 logging.basicConfig(level=logging.ERROR)
 
 
 def _extract_path(previous_nodes, target_node, path=[]):
-    path = [target_node] + path
-    if not previous_nodes[target_node]:
-        return path
-    else:
-        u = previous_nodes[target_node]
-        return _extract_path(previous_nodes, u, path=path)
+    reversed_path = []
+    node = target_node
+    while node is not None:
+        reversed_path.append(node)
+        node = previous_nodes[node]
+    return reversed_path[::-1] + path
 
 
 def simplex_2D(objective, constraints):
     pass
 
 
-def get_shortest_path(graph: Graph, source_name: str, target_name='',
-                      algorithm='dijkstra') -> tuple:
-    """Get shortest path from source to target in connected, undirected graph.
+def _out_arcs(graph, attr):
+    """Return a function that lists (neighbor, weight, edge) for the edges
+    leaving a vertex.
+
+    Vertices are keyed by name and edges are Edge objects for a Graph; for
+    a CSRGraph both are integer ids.
     """
-    logging.info(
-        'Starting the shortest path algorithm with source: {}'.format(
-            source_name))
-    try:
-        dists = {source_name: 0}  # holds shortest distances from source node
-        previous_nodes = {source_name: None}  # stores preceding node
-
-        i = 1
-        while len(dists) < len(graph.vertices):
-            logging.info('Iteration {}'.format(i))
-
-            candidates = []
-            for edge in graph.edges:
-                if (edge.source.name in dists and
-                        edge.target.name not in dists):  # crosses frontier
-                    dist = dists[edge.source.name] + edge.cost
-                    candidates.append((edge, dist))
-                else:
-                    continue
+    if isinstance(graph, CSRGraph):
+        offsets, targets = graph.offsets, graph.targets
+        weights = graph.edge_attrs[attr]
+
+        def arcs(u):
+            lo, hi = offsets[u], offsets[u + 1]
+            return zip(targets[lo:hi].tolist(), weights[lo:hi].tolist(),
+                       range(lo, hi))
+    else:
+        def arcs(u):
+            return [(e.target.name, getattr(e, attr), e)
+                    for e in graph.get_edges(source_name=u)]
+    return arcs
+
+
+def _in_arcs(graph, attr):
+    """Like _out_arcs, but for the edges entering a vertex."""
+    if isinstance(graph, CSRGraph):
+        in_offsets, in_edges = graph.in_offsets, graph.in_edges
+        sources, weights = graph.sources, graph.edge_attrs[attr]
+
+        def arcs(v):
+            ks = in_edges[in_offsets[v]:in_offsets[v + 1]]
+            return zip(sources[ks].tolist(), weights[ks].tolist(),
+                       ks.tolist())
+    else:
+        def arcs(v):
+            return [(e.source.name, getattr(e, attr), e)
+                    for e in graph.get_edges(target_name=v)]
+    return arcs
+
+
+def _vertex_keys(graph) -> list:
+    """Vertex keys in insertion order, the order of CSRGraph.names."""
+    if isinstance(graph, CSRGraph):
+        return list(range(graph.n_vertices))
+    return list(graph._vertices)
+
+
+def _to_key(graph, name):
+    if isinstance(graph, CSRGraph):
+        return graph.ids[name]
+    return name
+
+
+def _to_name(graph, key):
+    if isinstance(graph, CSRGraph) and key is not None:
+        return graph.names[key]
+    return key
+
+
+def _count(stats, **counts):
+    """Add the counts to a SolverStats, if any."""
+    if stats is not None:
+        for name, n in counts.items():
+            stats.count(name, n)
+
+
+def _dijkstra(arcs, source, target=None, heuristic=None,
+              stats=None) -> tuple:
+    """Heap based Dijkstra with lazy deletion of stale queue entries.
+
+    Ties are broken by insertion order, so for a given graph the first
+    predecessor that reaches a vertex with the minimal distance is kept.
+    The search stops as soon as `target` is settled. If a consistent
+    lower bound `heuristic(vertex)` on the distance to the target is given
+    the search becomes A*. Heap operations are counted into `stats`.
+    """
+    dists = {source: 0}  # holds shortest distances from source node
+    previous_nodes = {source: None}  # stores preceding node
+    settled = set()
+
+    if heuristic is not None:
+        estimates = {}  # the heuristic is evaluated once per vertex
+
+        def priority(u, dist):
+            if u not in estimates:
+                estimates[u] = heuristic(u)
+            return dist + estimates[u]
+    else:
+        def priority(u, dist):
+            return dist
+
+    counter = itertools.count()  # tie breaker, vertex names may not compare
+    heap = [(priority(source, 0), next(counter), source)]
+    n_pops = n_relaxed = 0
+    while heap:
+        _, _, u = heapq.heappop(heap)
+        n_pops += 1
+        if u in settled:  # stale entry
+            continue
+        settled.add(u)
+        if u == target:
+            break
+
+        dist = dists[u]
+        for v, cost, _ in arcs(u):
+            n_relaxed += 1
+            if v in settled:
+                continue
+            new_dist = dist + cost
+            if v not in dists or new_dist < dists[v]:
+                dists[v] = new_dist
+                previous_nodes[v] = u
+                heapq.heappush(
+                    heap, (priority(v, new_dist), next(counter), v))
+    _count(stats, heap_pushes=next(counter), heap_pops=n_pops,
+           edges_relaxed=n_relaxed, vertices_settled=len(settled))
+
+    # drop tentative labels of vertices that were never settled
+    for v in set(dists) - settled:
+        del dists[v]
+        del previous_nodes[v]
+
+    return dists, previous_nodes
+
+
+def _repair_decrease(out_arcs, dists, previous_nodes, u, v, cost):
+    """Repair a shortest path tree after the cost of edge u->v fell to
+    `cost` (or the edge was inserted): relax the edge and propagate the
+    improvement Dijkstra-style from v."""
+    if u not in dists or dists[u] + cost >= dists.get(v, np.inf):
+        return
+    dists[v] = dists[u] + cost
+    previous_nodes[v] = u
+    counter = itertools.count()
+    heap = [(dists[v], next(counter), v)]
+    while heap:
+        dist, _, x = heapq.heappop(heap)
+        if dist > dists[x]:  # stale entry
+            continue
+        for w, cost, _ in out_arcs(x):
+            if dist + cost < dists.get(w, np.inf):
+                dists[w] = dist + cost
+                previous_nodes[w] = x
+                heapq.heappush(heap, (dists[w], next(counter), w))
+
+
+def _repair_increase(out_arcs, in_arcs, dists, previous_nodes, v):
+    """Repair a shortest path tree after the cost of the tree edge into v
+    rose (Ramalingam-Reps).
+
+    Only the subtree of v can get longer. Its vertices are relabeled from
+    their best edge out of the unaffected part, then by a Dijkstra
+    restricted to the subtree; vertices left unlabeled are unreachable.
+    """
+    affected = {v}
+    stack = [v]
+    while stack:
+        x = stack.pop()
+        for w, _, _ in out_arcs(x):
+            if w not in affected and previous_nodes.get(w) == x:
+                affected.add(w)
+                stack.append(w)
+    for x in affected:
+        del dists[x]
+        del previous_nodes[x]
+
+    counter = itertools.count()
+    heap = []
+    for x in affected:
+        for y, cost, _ in in_arcs(x):
+            if y in dists and dists[y] + cost < dists.get(x, np.inf):
+                dists[x] = dists[y] + cost
+                previous_nodes[x] = y
+        if x in dists:
+            heap.append((dists[x], next(counter), x))
+    heapq.heapify(heap)
+
+    settled = set()
+    while heap:
+        dist, _, x = heapq.heappop(heap)
+        if x in settled or dist > dists[x]:
+            continue
+        settled.add(x)
+        for w, cost, _ in out_arcs(x):
+            if (w in affected and w not in settled and
+                    dist + cost < dists.get(w, np.inf)):
+                dists[w] = dist + cost
+                previous_nodes[w] = x
+                heapq.heappush(heap, (dists[w], next(counter), w))
+
+
+def _bidirectional_dijkstra(out_arcs, in_arcs, source, target,
+                            stats=None) -> tuple:
+    """Alternate forward and backward Dijkstra searches until the sum of
+    the two queue minima exceeds the best source-target distance seen.
+    """
+    if source == target:
+        return 0, [source]
+
+    arcs = (out_arcs, in_arcs)
+    dists = ({source: 0}, {target: 0})
+    previous_nodes = ({source: None}, {target: None})
+    settled = (set(), set())
+    counter = itertools.count()
+    heaps = ([(0, next(counter), source)], [(0, next(counter), target)])
+
+    best, meeting_node = np.inf, None
+    n_pops = n_relaxed = 0
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        dist, _, u = heapq.heappop(heaps[side])
+        n_pops += 1
+        if u in settled[side]:  # stale entry
+            continue
+        settled[side].add(u)
+
+        for v, cost, _ in arcs[side](u):
+            n_relaxed += 1
+            new_dist = dist + cost
+            if v not in dists[side] or new_dist < dists[side][v]:
+                dists[side][v] = new_dist
+                previous_nodes[side][v] = u
+                heapq.heappush(heaps[side], (new_dist, next(counter), v))
+            if v in dists[1 - side]:
+                total = dists[side][v] + dists[1 - side][v]
+                if total < best:
+                    best, meeting_node = total, v
+    _count(stats, heap_pushes=next(counter), heap_pops=n_pops,
+           edges_relaxed=n_relaxed,
+           vertices_settled=len(settled[0]) + len(settled[1]))
+
+    if meeting_node is None:
+        raise KeyError(target)
+
+    forward = _extract_path(previous_nodes[0], meeting_node)
+    backward = _extract_path(previous_nodes[1], meeting_node)[::-1]
+    return best, forward + backward[1:]
+
+
+def _bellman_ford(arcs, source, n_vertices, stats=None) -> tuple:
+    """Queue based Bellman-Ford (SPFA) that allows negative edge costs.
+
+    Raises a ValueError if a negative cycle is reachable from the source.
+    Queue operations are counted into `stats` as heap operations.
+    """
+    dists = {source: 0}
+    previous_nodes = {source: None}
+    # number of edges on the current shortest path to each vertex
+    path_lengths = {source: 0}
+
+    queue = collections.deque([source])
+    queued = {source}
+    n_pushes, n_pops, n_relaxed = 1, 0, 0
+    while queue:
+        u = queue.popleft()
+        queued.discard(u)
+        n_pops += 1
+        dist = dists[u]
+        for v, cost, _ in arcs(u):
+            n_relaxed += 1
+            new_dist = dist + cost
+            if v not in dists or new_dist < dists[v]:
+                dists[v] = new_dist
+                previous_nodes[v] = u
+                path_lengths[v] = path_lengths[u] + 1
+                if path_lengths[v] >= n_vertices:
+                    raise ValueError('Negative cycle reachable from source.')
+                if v not in queued:
+                    queue.append(v)
+                    queued.add(v)
+                    n_pushes += 1
+    _count(stats, heap_pushes=n_pushes, heap_pops=n_pops,
+           edges_relaxed=n_relaxed, vertices_settled=len(dists))
+
+    return dists, previous_nodes
+
+
+def get_shortest_path(graph, source_name: str, target_name='',
+                      algorithm='dijkstra', heuristic=None,
+                      stats=None) -> tuple:
+    """Get shortest path from source to target.
+
+    graph is a Graph or its CSRGraph snapshot. Returns (distance, path) if
+    a target is given, otherwise the (dists, previous_nodes) shortest path
+    tree rooted at the source.
+
+    algorithm is one of
+        'dijkstra': heap based Dijkstra, non-negative costs.
+        'bidirectional': bidirectional Dijkstra, requires a target.
+        'astar': A* guided by heuristic(vertex, target_vertex), which must
+            be a consistent lower bound on the remaining cost. Requires a
+            target.
+        'bellman_ford': SPFA, allows negative costs and raises a ValueError
+            on negative cycles.
+
+    Heap operations, relaxed edges and the time taken are added to
+    `stats`, a SolverStats, if given.
+    """
+    logging.info('Starting the shortest path algorithm with source: %s',
+                 source_name)
+    start_time = time.perf_counter()
+    result = _shortest_path(graph, source_name, target_name, algorithm,
+                            heuristic, stats)
+    if stats is not None:
+        stats.add_time('total', time.perf_counter() - start_time)
+        stats.notify('finish')
+    return result
+
+
+def _shortest_path(graph, source_name, target_name, algorithm, heuristic,
+                   stats) -> tuple:
+    has_target = target_name is not None and target_name != ''
+    if algorithm in ('bidirectional', 'astar') and not has_target:
+        raise ValueError(
+            'Algorithm {} requires a target.'.format(algorithm))
+
+    source = _to_key(graph, source_name)
+    target = _to_key(graph, target_name) if has_target else None
+    arcs = _out_arcs(graph, 'cost')
+
+    if algorithm == 'dijkstra':
+        dists, previous_nodes = _dijkstra(arcs, source, target, stats=stats)
+    elif algorithm == 'astar':
+        if heuristic is None:
+            raise ValueError('Algorithm astar requires a heuristic.')
+        target_vertex = graph.get_vertex(target_name)
+        dists, previous_nodes = _dijkstra(
+            arcs, source, target, heuristic=lambda u: heuristic(
+                graph.get_vertex(_to_name(graph, u)), target_vertex),
+            stats=stats)
+    elif algorithm == 'bidirectional':
+        distance, path = _bidirectional_dijkstra(
+            arcs, _in_arcs(graph, 'cost'), source, target, stats)
+        return distance, [_to_name(graph, u) for u in path]
+    elif algorithm == 'bellman_ford':
+        dists, previous_nodes = _bellman_ford(
+            arcs, source, len(_vertex_keys(graph)), stats)
+    else:
+        raise ValueError('Unknown algorithm: {}'.format(algorithm))
+
+    if has_target:  # a target node was provided
+        shortest_path = _extract_path(previous_nodes, target)
+        shortest_distance = dists[target]
+        return shortest_distance, [_to_name(graph, u) for u in shortest_path]
+
+    elif isinstance(graph, CSRGraph):
+        return (dict((graph.names[u], d) for u, d in dists.items()),
+                dict((graph.names[u], _to_name(graph, p))
+                     for u, p in previous_nodes.items()))
+    else:
+        return dists, previous_nodes
+
+
+def _shortest_path_tree(graph, source, algorithm) -> tuple:
+    """Return the (dists, previous_nodes) tree of source, keyed like the
+    graph's vertices."""
+    arcs = _out_arcs(graph, 'cost')
+    if algorithm == 'dijkstra':
+        return _dijkstra(arcs, source)
+    elif algorithm == 'bellman_ford':
+        return _bellman_ford(arcs, source, len(_vertex_keys(graph)))
+    raise ValueError('Unknown algorithm: {}'.format(algorithm))
+
+
+_worker_graph = None  # per process
+
+
+def _init_path_worker(graph):
+    global _worker_graph
+    _worker_graph = graph
+
 
-            sorted_candidates = sorted(
-                candidates, key=lambda x: x[1])  # sort by cost
-            logging.debug('Candidate edges: {}'.format(sorted_candidates))
-
-            n = len(sorted_candidates)
-            if n > 0:
-                best_candidates = [sorted_candidates[0]]
-                j = 0
-                while (j + 1 < n and
-                        sorted_candidates[j][1] == sorted_candidates[j + 1][1]):
-                    best_candidates.append(sorted_candidates[j + 1])
-                    j += 1
+def _shortest_path_tree_in_worker(task: tuple) -> tuple:
+    return _shortest_path_tree(_worker_graph, *task)
+
+
+def get_shortest_paths(graph, source_names, target_names=None,
+                       algorithm='dijkstra', workers=1) -> tuple:
+    """Get the shortest paths from every source to every target.
+
+    Each source's shortest path tree ('dijkstra' or 'bellman_ford' on the
+    'cost' edge attribute) is computed once and cached on the graph until
+    its version changes (see Graph.version), so repeated queries from the
+    same sources are answered from the cache. With workers > 1 the
+    missing trees are computed in a process pool.
+
+    target_names defaults to all vertices in insertion order (the order
+    of CSRGraph.names). Returns a (sources, targets) array of distances
+    (np.inf if unreachable), with rows and columns in the order of
+    source_names and target_names, and a dict mapping each (source name,
+    target name) to its path (None if unreachable).
+    """
+    if algorithm not in ('dijkstra', 'bellman_ford'):
+        raise ValueError('Unknown algorithm: {}'.format(algorithm))
+    source_names = list(source_names)
+    if target_names is None:
+        target_names = [_to_name(graph, u) for u in _vertex_keys(graph)]
+    target_names = list(target_names)
+    sources = [_to_key(graph, name) for name in source_names]
+    targets = [_to_key(graph, name) for name in target_names]
+
+    trees = {}
+    for source in sources:
+        cached = graph._trees.get((source, algorithm))
+        if cached is not None and cached[0] == graph.version:
+            trees[source] = cached[1]
+    missing = [u for u in dict.fromkeys(sources) if u not in trees]
+    if workers > 1 and len(missing) > 1:
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_path_worker,
+                initargs=(graph,)) as executor:
+            computed = executor.map(_shortest_path_tree_in_worker,
+                                    [(u, algorithm) for u in missing])
+            trees.update(zip(missing, computed))
+    else:
+        for source in missing:
+            trees[source] = _shortest_path_tree(graph, source, algorithm)
+    for source in missing:
+        graph._trees[(source, algorithm)] = (graph.version, trees[source])
+
+    distances = np.full((len(sources), len(targets)), np.inf)
+    paths = {}
+    for i, (source, source_name) in enumerate(zip(sources, source_names)):
+        dists, previous_nodes = trees[source]
+        for j, (target, target_name) in enumerate(
+                zip(targets, target_names)):
+            if target in dists:
+                distances[i, j] = dists[target]
+                paths[(source_name, target_name)] = [
+                    _to_name(graph, u)
+                    for u in _extract_path(previous_nodes, target)]
             else:
-                logging.info('No more edges to explore!')
-                break
+                paths[(source_name, target_name)] = None
+    return distances, paths
+
+
+class ShortestPathTree():
+    """Shortest path tree from a source of a Graph with non-negative
+    'cost' edges, kept up to date as edge costs change.
+
+    Change the graph through the tree's update_edge and add_edge: a cost
+    decrease or an insertion propagates from the edge's target, and a
+    cost increase of a tree edge only relabels the subtree below it. If
+    the graph was changed otherwise (its version moved on), the tree is
+    recomputed on the next access.
+    """
+    def __init__(self, graph: Graph, source_name):
+        self.graph = graph
+        self.source_name = source_name
+        self.version = None
+        self.dists = None
+        self.previous_nodes = None
+        self._sync()
 
-            for edge, dist in best_candidates:
-                dists.update({edge.target.name: dist})
-                # TODO: improve tie breaking
-                previous_nodes.update({edge.target.name: edge.source.name})
-                logging.info('Edge selected: {}-->{} ({})'.format(
-                    edge.source.name, edge.target.name, dist))
+    def _sync(self):
+        if self.version != self.graph.version:
+            self.dists, self.previous_nodes = get_shortest_path(
+                self.graph, self.source_name, target_name=None)
+            self.version = self.graph.version
 
-            logging.debug('len(dists): {}, len(graph.vertices): {}'.format(
-                len(dists), len(graph.vertices)))
+    def update_edge(self, source_name, target_name, **kwargs):
+        self._sync()
+        edge = self.graph.get_edge(source_name, target_name)
+        old_cost = edge.cost
+        self.graph.update_edge(source_name, target_name, **kwargs)
+        self.version = self.graph.version
 
-            i += 1
+        out_arcs = _out_arcs(self.graph, 'cost')
+        if edge.cost < old_cost:
+            _repair_decrease(out_arcs, self.dists, self.previous_nodes,
+                             source_name, target_name, edge.cost)
+        elif (edge.cost > old_cost and
+                self.previous_nodes.get(target_name) == source_name):
+            _repair_increase(out_arcs, _in_arcs(self.graph, 'cost'),
+                             self.dists, self.previous_nodes, target_name)
 
-        if target_name:  # a target node was provided
-            shortest_path = _extract_path(previous_nodes, target_name)
-            shortest_distance = dists[target_name]
-            return shortest_distance, shortest_path
+    def add_edge(self, edge: Edge):
+        self._sync()
+        self.graph.add_edge(edge)
+        self.version = self.graph.version
+        _repair_decrease(_out_arcs(self.graph, 'cost'), self.dists,
+                         self.previous_nodes, edge.source.name,
+                         edge.target.name, edge.cost)
 
+    def get_path(self, target_name) -> tuple:
+        """Return (distance, path) to target, (np.inf, None) if it cannot
+        be reached."""
+        self._sync()
+        if target_name not in self.dists:
+            return np.inf, None
+        return (self.dists[target_name],
+                _extract_path(self.previous_nodes, target_name))
+
+
+def _vogel(cost, supply, demand) -> tuple:
+    """Vogel's approximation of a balanced transportation problem.
+
+    Every step allocates the cheapest cell of the row or column with the
+    largest difference between its two cheapest cells and crosses out one
+    line, so the n + m - 1 allocated cells (some possibly 0) form a
+    spanning tree basis.
+    """
+    n, m = cost.shape
+    supply, demand = supply.copy(), demand.copy()
+    rows = np.ones(n, dtype=bool)
+    cols = np.ones(m, dtype=bool)
+    flows = np.zeros((n, m))
+    basis = []
+    while rows.any() and cols.any():
+        active = cost[np.ix_(rows, cols)]
+        row_ids, col_ids = np.flatnonzero(rows), np.flatnonzero(cols)
+        if len(row_ids) == 1 or len(col_ids) == 1:
+            k = np.argmin(active)
+            i, j = np.unravel_index(k, active.shape)
+        else:
+            low = np.partition(active, 1, axis=1)
+            row_penalty = low[:, 1] - low[:, 0]
+            low = np.partition(active, 1, axis=0)
+            col_penalty = low[1] - low[0]
+            if row_penalty.max() >= col_penalty.max():
+                i = np.argmax(row_penalty)
+                j = np.argmin(active[i])
+            else:
+                j = np.argmax(col_penalty)
+                i = np.argmin(active[:, j])
+        i, j = row_ids[i], col_ids[j]
+
+        amount = min(supply[i], demand[j])
+        flows[i, j] = amount
+        basis.append((i, j))
+        supply[i] -= amount
+        demand[j] -= amount
+        last_row, last_col = len(row_ids) == 1, len(col_ids) == 1
+        if last_row and last_col:
+            rows[i] = cols[j] = False
+        elif last_col or (not last_row and supply[i] <= demand[j]):
+            rows[i] = False
         else:
-            return dists, previous_nodes
+            cols[j] = False
+    return flows, basis
 
-    except ValueError as e:
-        logging.error(e)
 
+def _basis_flows(basis, supply, demand):
+    """Flows of a spanning tree basis, found by peeling its leaves.
 
-def transportation_simplex(prob: TransportationProblem):
-    pass
+    Returns None if the basis is not a spanning tree or its flows are
+    negative (infeasible for these supplies and demands).
+    """
+    n, m = len(supply), len(demand)
+    if len(basis) != n + m - 1:
+        return None
+    remaining = np.concatenate([supply, demand])
+    adjacency = [set() for _ in range(n + m)]
+    for i, j in basis:
+        adjacency[i].add(n + j)
+        adjacency[n + j].add(i)
 
+    flows = np.zeros((n, m))
+    leaves = [a for a in range(n + m) if len(adjacency[a]) == 1]
+    n_peeled = 0
+    while leaves:
+        a = leaves.pop()
+        if len(adjacency[a]) != 1:
+            continue
+        b = adjacency[a].pop()
+        adjacency[b].discard(a)
+        i, j = (a, b - n) if a < n else (b, a - n)
+        flows[i, j] = remaining[a]
+        remaining[b] -= remaining[a]
+        remaining[a] = 0
+        n_peeled += 1
+        if len(adjacency[b]) == 1:
+            leaves.append(b)
+    scale = max(1., np.abs(supply).max(initial=0))
+    if n_peeled != n + m - 1 or (flows < -tolerance * scale).any():
+        return None
+    return np.maximum(flows, 0)
 
-def hungarian_method(prob: AssignmentProblem):
-    pass
 
+def _potentials(cost, basis, n, m) -> tuple:
+    """Dual potentials with u_i + v_j = c_ij on the basis, u_0 = 0."""
+    adjacency = [[] for _ in range(n + m)]
+    for i, j in basis:
+        adjacency[i].append(n + j)
+        adjacency[n + j].append(i)
+    potentials = np.full(n + m, np.nan)
+    potentials[0] = 0
+    queue = collections.deque([0])
+    while queue:
+        a = queue.popleft()
+        for b in adjacency[a]:
+            if np.isnan(potentials[b]):
+                i, j = (a, b - n) if a < n else (b, a - n)
+                potentials[b] = cost[i, j] - potentials[a]
+                queue.append(b)
+    return potentials[:n], potentials[n:]
 
-# TODO: write mixed integer version of algo.
-def branch_and_bound(bip: BinaryIntegerProblem, var_index=0) -> dict:
-    # Bound
-    lp_result = bip.solve_lp_relaxation()
-    lp_status = lp_result.get('status')
-    lp_value = lp_result.get('optimal_value')
-    lp_solution = lp_result.get('optimal_solution')
 
+def _tree_path(basis, n, m, source, target) -> list:
+    """Nodes on the basis tree path from row `source` to column `target`
+    (node n + j)."""
+    adjacency = [[] for _ in range(n + m)]
+    for i, j in basis:
+        adjacency[i].append(n + j)
+        adjacency[n + j].append(i)
+    previous = {source: None}
+    queue = collections.deque([source])
+    while target not in previous:
+        a = queue.popleft()
+        for b in adjacency[a]:
+            if b not in previous:
+                previous[b] = a
+                queue.append(b)
+    return _extract_path(previous, target)
+
+
+def _transportation_pivots(cost, flows, basis, fixed, max_iterations):
+    """MODI pricing and stepping-stone pivots until no cell has a negative
+    reduced cost. Cells in `fixed` are bounded to 0: they never enter and
+    leave as soon as a cycle would increase them.
+
+    After max(n, m) consecutive degenerate pivots, Bland's rule (first
+    improving cell, first leaving cell) is used to prevent cycling.
+    """
+    n, m = cost.shape
+    scale = max(1., np.abs(cost).max(initial=0))
+    degenerate = 0
+    for _ in range(max_iterations):
+        u, v = _potentials(cost, basis, n, m)
+        reduced = cost - u[:, None] - v[None, :]
+        reduced[fixed] = np.inf
+        bland = degenerate > max(n, m)
+        if bland:
+            improving = np.flatnonzero(reduced < -tolerance * scale)
+            if not len(improving):
+                return 'optimal'
+            i, j = np.unravel_index(improving[0], reduced.shape)
+        else:
+            i, j = np.unravel_index(np.argmin(reduced), reduced.shape)
+            if reduced[i, j] >= -tolerance * scale:
+                return 'optimal'
+
+        # the cycle alternates +, - starting from the entering cell
+        path = _tree_path(basis, n, m, i, n + j)
+        cells = [(a, b - n) if a < n else (b, a - n)
+                 for a, b in zip(path[:-1], path[1:])][::-1]
+        minus, plus = cells[0::2], cells[1::2]
+        limits = [(flows[c], c) for c in minus]
+        limits += [(0., c) for c in plus if fixed[c]]
+        if bland:
+            theta, leaving = min(limits)
+        else:
+            theta, leaving = min(limits, key=lambda limit: limit[0])
+        degenerate = degenerate + 1 if theta <= tolerance else 0
+
+        for c in minus:
+            flows[c] -= theta
+        for c in plus:
+            flows[c] += theta
+        flows[i, j] = theta
+        flows[leaving] = 0
+        basis.remove(leaving)
+        basis.append((i, j))
+    return 'iteration_limit'
+
+
+def transportation_simplex(prob: TransportationProblem, basis=None,
+                           max_iterations=None) -> dict:
+    """Solve a transportation problem by the transportation simplex.
+
+    Starts from Vogel's approximation, or from `basis` (the 'basis' of an
+    earlier result of the same shape) if its flows are still feasible,
+    and improves it with MODI (u-v) pricing and stepping-stone pivots.
+    Forbidden (infinite cost) cells are kept at zero flow; a problem that
+    cannot be solved without them is infeasible.
+
+    Returns the status, optimal value, (n, m) flows, dual potentials
+    'u' and 'v' (the reduced costs c_ij - u_i - v_j of the optimal basis
+    are non-negative) and the basis of the balanced problem.
+    """
+    supply, demand, cost = prob.supply, prob.demand, prob.cost
+    if (np.isnan(cost).any() or np.isneginf(cost).any() or
+            (supply < 0).any() or (demand < 0).any()):
+        raise ValueError('Supplies and demands must be non-negative and '
+                         'costs numbers or +inf (forbidden).')
+    n, m = cost.shape
     result = {'status': None,
               'optimal_value': None,
-              'optimal_solution': None, }
+              'optimal_solution': None,
+              'u': None,
+              'v': None,
+              'basis': None, }
 
-    global z_star
+    # balance with a dummy source or destination at zero cost
+    excess = supply.sum() - demand.sum()
+    scale = max(1., supply.sum())
+    balanced_cost = cost
+    if excess > tolerance * scale:
+        balanced_cost = np.hstack([cost, np.zeros((n, 1))])
+        demand = np.append(demand, excess)
+    elif excess < -tolerance * scale:
+        balanced_cost = np.vstack([cost, np.zeros((1, m))])
+        supply = np.append(supply, -excess)
+    else:
+        demand = demand * supply.sum() / max(demand.sum(), tolerance)
+    fixed = np.isinf(balanced_cost)
+    balanced_cost = np.where(fixed, 0., balanced_cost)
+    if max_iterations is None:
+        max_iterations = 50 * balanced_cost.size + 100
 
-    if (lp_status != 'optimal' or
-            lp_value <= z_star):  # fathom: lp infeasible or suboptimal
-        result.update(
-            {'status': lp_status,
-             'optimal_value': -np.inf, })
+    flows = None
+    if basis is not None:
+        basis = [tuple(c) for c in basis]
+        flows = _basis_flows(basis, supply, demand)
+        if flows is not None and (flows[fixed] > tolerance * scale).any():
+            flows = None
+    if flows is None:
+        # forbidden cells cost more than any path of allowed ones
+        penalty = (np.abs(balanced_cost).max(initial=0) + 1) * sum(
+            balanced_cost.shape)
+        flows, basis = _vogel(np.where(fixed, penalty, balanced_cost),
+                              supply, demand)
 
-    elif is_integer_solution(
-            lp_solution, epsilon=tolerance):  # fathom: integer solution found
-        z_star = max(z_star, lp_value)
-        result.update(
-            {'status': lp_status,
-             'optimal_value': lp_value,
-             'optimal_solution': [int(x) for x in lp_solution], })
+    # phase 1: drive the flow off forbidden cells
+    if (flows[fixed] > tolerance * scale).any():
+        no_fixed = np.zeros_like(fixed)
+        status = _transportation_pivots(fixed.astype(float), flows, basis,
+                                        no_fixed, max_iterations)
+        if status != 'optimal':
+            result['status'] = status
+            return result
+        if (flows[fixed] > tolerance * scale).any():
+            result['status'] = 'infeasible'
+            return result
+        flows[fixed] = 0
 
-    elif var_index >= len(bip.variables()):  # fathom: reached a leaf node
-        result.update(
-            {'status': 'optimal',
-             'optimal_value': bip.objective.value,
-             'optimal_solution': [int(v.value[0]) for v in bip.variables()], })
-    else:
-        # Branch
-        # cvxpy does not guarantee sorting of variables
-        split_var = sorted(bip.variables(), key=lambda x: x.id)[var_index]
+    status = _transportation_pivots(balanced_cost, flows, basis, fixed,
+                                    max_iterations)
+    u, v = _potentials(balanced_cost, basis, *balanced_cost.shape)
+    flows = flows[:n, :m]
+    result.update(
+        {'status': status,
+         'optimal_value': float((balanced_cost[:n, :m] * flows).sum()),
+         'optimal_solution': flows,
+         'u': u[:n],
+         'v': v[:m],
+         'basis': sorted((int(i), int(j)) for i, j in basis), })
+    return result
+
+
+def _check_costs(costs):
+    costs = np.asarray(costs, dtype=float)
+    if np.isnan(costs).any() or np.isneginf(costs).any():
+        raise ValueError('Costs must be numbers or +inf (forbidden).')
+    return costs
+
+
+def _assign(costs):
+    """Shortest augmenting path (Jonker-Volgenant) assignment of a stack
+    of (k, n, m) cost matrices with n <= m, solved in lockstep.
+
+    Row by row, a Dijkstra search over the reduced costs `c - u - v`
+    finds the cheapest augmenting path from the new row to a free column,
+    and the dual potentials u, v are updated to keep reduced costs
+    non-negative. The k problems share every NumPy operation; a problem
+    whose row cannot reach a free column (forbidden entries only) is
+    infeasible and drops out.
+
+    Returns (col4row, feasible).
+    """
+    k, n, m = costs.shape
+    u = np.zeros((k, n))
+    v = np.zeros((k, m))
+    col4row = np.full((k, n), -1)
+    row4col = np.full((k, m), -1)
+    feasible = np.ones(k, dtype=bool)
+    batch = np.arange(k)
+
+    for cur_row in range(n):
+        shortest = np.full((k, m), np.inf)
+        path = np.full((k, m), -1)
+        visited_rows = np.zeros((k, n), dtype=bool)
+        visited_cols = np.zeros((k, m), dtype=bool)
+        min_val = np.zeros(k)
+        row = np.full(k, cur_row)
+        sink = np.full(k, -1)
+
+        active = batch[feasible]
+        while len(active):
+            i = row[active]
+            visited_rows[active, i] = True
+            reduced = (min_val[active, None] + costs[active, i] -
+                       u[active, i, None] - v[active])
+            better = ~visited_cols[active] & (reduced < shortest[active])
+            shortest[active] = np.where(better, reduced, shortest[active])
+            path[active] = np.where(better, i[:, None], path[active])
+
+            # closest unvisited column, preferring free columns on ties
+            candidates = np.where(visited_cols[active], np.inf,
+                                  shortest[active])
+            low = candidates.min(axis=1)
+            closest = candidates == low[:, None]
+            free = closest & (row4col[active] == -1)
+            j = np.where(free.any(axis=1), free.argmax(axis=1),
+                         closest.argmax(axis=1))
+
+            blocked = ~np.isfinite(low)
+            feasible[active[blocked]] = False
+            active, j, low = active[~blocked], j[~blocked], low[~blocked]
+
+            min_val[active] = low
+            visited_cols[active, j] = True
+            reached = row4col[active, j] == -1
+            sink[active[reached]] = j[reached]
+            row[active[~reached]] = row4col[active[~reached], j[~reached]]
+            active = active[~reached]
+
+        # update the dual potentials
+        done = batch[feasible]
+        u[done, cur_row] += min_val[done]
+        rows = visited_rows & feasible[:, None]
+        rows[:, cur_row] = False
+        b, i = np.nonzero(rows)
+        u[b, i] += min_val[b] - shortest[b, col4row[b, i]]
+        cols = visited_cols & feasible[:, None]
+        v[cols] -= (min_val[:, None] - shortest)[cols]
+
+        # augment along the path back from the sink
+        j = sink[done]
+        while len(done):
+            i = path[done, j]
+            row4col[done, j] = i
+            j, col4row[done, i] = col4row[done, i], j
+            more = i != cur_row
+            done, j = done[more], j[more]
+
+    return col4row, feasible
+
+
+def hungarian_method_batch(costs) -> dict:
+    """Solve a stack of k assignment problems with (n, m) cost matrices.
+
+    Returns a dict of arrays: 'status' ('optimal' or 'infeasible'),
+    'optimal_value' (inf if infeasible) and 'optimal_solution', the
+    (k, n) columns assigned to each row (-1 if unassigned).
+    """
+    costs = _check_costs(costs)
+    if costs.ndim != 3:
+        raise ValueError('Expected a (k, n, m) stack of cost matrices.')
+    k, n, m = costs.shape
+
+    if n <= m:
+        col4row, feasible = _assign(costs)
+    else:  # assign the columns to rows instead
+        row4col, feasible = _assign(costs.transpose(0, 2, 1))
+        col4row = np.full((k, n), -1)
+        b, j = np.nonzero(row4col >= 0)
+        col4row[b, row4col[b, j]] = j
+    col4row[~feasible] = -1
+
+    b, i = np.nonzero(col4row >= 0)
+    values = np.zeros(k)
+    np.add.at(values, b, costs[b, i, col4row[b, i]])
+    values[~feasible] = np.inf
+
+    return {'status': np.where(feasible, 'optimal', 'infeasible'),
+            'optimal_value': values,
+            'optimal_solution': col4row, }
+
+
+def hungarian_method(prob: AssignmentProblem) -> dict:
+    """Solve an assignment problem (or a cost matrix) in O(n^3).
+
+    Rectangular matrices assign min(n, m) pairs and infinite costs are
+    forbidden. The optimal solution lists the column assigned to each row,
+    -1 if unassigned. See hungarian_method_batch to solve many problems
+    of the same shape in one call.
+    """
+    cost = prob.cost if isinstance(prob, AssignmentProblem) else prob
+    cost = _check_costs(cost)
+    if cost.ndim != 2:
+        raise ValueError('The cost must be a matrix.')
+
+    result = hungarian_method_batch(cost[None])
+    status = str(result['status'][0])
+    return {'status': status,
+            'optimal_value': float(result['optimal_value'][0]),
+            'optimal_solution': (result['optimal_solution'][0].tolist()
+                                 if status == 'optimal' else None), }
+
+
+class _Node():
+    """An open branch and bound node.
+
+    `bound` is the LP bound of the parent (the node LP is solved lazily
+    when the node is selected), `fixings` is a tuple of (entry, direction,
+    value) bound changes, where direction 0 sets the upper bound of the
+    solution entry to value and direction 1 its lower bound, and `branch`
+    records (entry, direction, fractional part, parent bound) of the
+    branching that created the node.
+    """
+    __slots__ = ('bound', 'estimate', 'depth', 'fixings', 'branch')
 
-        # subproblem1
-        sub1 = BinaryIntegerProblem(
-            bip.objective, bip.constraints + [split_var <= 0])
-        result1 = branch_and_bound(sub1, var_index + 1)
+    def __init__(self, bound, estimate, depth, fixings, branch=None):
+        self.bound = bound
+        self.estimate = estimate
+        self.depth = depth
+        self.fixings = fixings
+        self.branch = branch
 
-        # subproblem2
-        sub2 = BinaryIntegerProblem(
-            bip.objective, bip.constraints + [split_var >= 1])
-        result2 = branch_and_bound(sub2, var_index + 1)
 
-        val1 = result1.get('optimal_value')
-        val2 = result2.get('optimal_value')
+class _BranchAndBoundState():
+    """Incumbent, open nodes and branching statistics of a single solve.
 
-        z_star = max(z_star, val1, val2)
+    Objective values are stored in maximization form, i.e. multiplied by
+    `sense` which is -1 for minimization problems.
+    """
+    def __init__(self, sense, node_selection, abs_gap=0., rel_gap=0.):
+        if node_selection not in ('depth_first', 'best_bound',
+                                  'best_estimate'):
+            raise ValueError(
+                'Unknown node selection: {}'.format(node_selection))
+        self.sense = sense
+        self.node_selection = node_selection
+        self.abs_gap = abs_gap
+        self.rel_gap = rel_gap
+        self.incumbent = -np.inf
+        self.incumbent_solution = None
+        self.pseudo_costs = {}  # (index, direction) -> [total, count]
+        self.nodes = []
+        self.counter = itertools.count()
+
+    def push(self, node: _Node):
+        if self.node_selection == 'depth_first':
+            key = -node.depth
+        elif self.node_selection == 'best_bound':
+            key = -node.bound
+        else:
+            key = -node.estimate
+        heapq.heappush(self.nodes, (key, next(self.counter), node))
+
+    def pop(self) -> _Node:
+        return heapq.heappop(self.nodes)[2]
+
+    def prune_threshold(self):
+        """Bound at or below which a node cannot improve the incumbent by
+        more than the gap tolerances."""
+        if self.incumbent_solution is None:
+            return -np.inf
+        return self.incumbent + max(
+            tolerance, self.abs_gap, self.rel_gap * abs(self.incumbent))
+
+    def dual_bound(self):
+        """Best bound over the incumbent and all open nodes."""
+        if not self.nodes:
+            return self.incumbent
+        if self.node_selection == 'best_bound':
+            bound = self.nodes[0][2].bound
+        else:
+            bound = max(node.bound for _, _, node in self.nodes)
+        return max(bound, self.incumbent)
+
+    def gap(self):
+        """Relative gap between the dual bound and the incumbent."""
+        if self.incumbent_solution is None:
+            return np.inf
+        return (self.dual_bound() - self.incumbent) / max(
+            abs(self.incumbent), tolerance)
+
+    def update_incumbent(self, value, solution):
+        if value > self.incumbent:
+            self.incumbent = value
+            self.incumbent_solution = solution
+
+    def record_pseudo_cost(self, index, direction, change, degradation):
+        total = self.pseudo_costs.setdefault((index, direction), [0., 0])
+        total[0] += max(degradation, 0) / change
+        total[1] += 1
+
+    def pseudo_cost(self, index, direction):
+        """Average objective degradation per unit change, falling back to
+        the average over all variables when `index` was never branched on.
+        """
+        if (index, direction) in self.pseudo_costs:
+            total, count = self.pseudo_costs[(index, direction)]
+            return total / count
+        known = [t / c for (_, d), (t, c) in self.pseudo_costs.items()
+                 if d == direction]
+        return sum(known) / len(known) if known else 1.
+
+
+def _select_branching_variable(state, fractional, branching):
+    """Pick the index to branch on among (index, fractional part) pairs."""
+    if branching == 'most_fractional':
+        return max(fractional, key=lambda x: min(x[1], 1 - x[1]))[0]
+    elif branching == 'pseudo_cost':  # product score
+        return max(fractional, key=lambda x: max(
+            state.pseudo_cost(x[0], 0) * x[1], tolerance) * max(
+            state.pseudo_cost(x[0], 1) * (1 - x[1]), tolerance))[0]
+    raise ValueError('Unknown branching rule: {}'.format(branching))
+
+
+def _process_node(state, node: _Node, bound, lp_solution, integer_index,
+                  branching) -> str:
+    """Fathom or branch a node given its LP bound and solution.
+
+    Returns what became of the node: 'pruned', 'integral' or 'branched'.
+    """
+    if node.branch is not None:
+        k, direction, frac, parent_bound = node.branch
+        state.record_pseudo_cost(
+            k, direction, frac if direction == 0 else 1 - frac,
+            parent_bound - bound)
+
+    if bound <= state.prune_threshold():  # fathom: suboptimal
+        return 'pruned'
+
+    values = lp_solution[integer_index]
+    fracs = values - np.floor(values)
+    is_fractional = np.abs(values - np.round(values)) > tolerance
+    fractional = list(zip(integer_index[is_fractional].tolist(),
+                          fracs[is_fractional].tolist()))
+    if not fractional:  # fathom: integer solution found
+        logging.info('New incumbent: %s', state.sense * bound)
+        solution = lp_solution.copy()
+        solution[integer_index] = np.round(values)
+        state.update_incumbent(bound, solution)
+        return 'integral'
+
+    # Branch: floor on the down branch, ceil on the up branch
+    k = _select_branching_variable(state, fractional, branching)
+    frac = lp_solution[k] - np.floor(lp_solution[k])
+    estimate = bound - sum(
+        min(state.pseudo_cost(i, 0) * f, state.pseudo_cost(i, 1) * (1 - f))
+        for i, f in fractional)
+    for direction, value in ((0, np.floor(lp_solution[k])),
+                             (1, np.ceil(lp_solution[k]))):
+        state.push(_Node(bound, estimate, node.depth + 1,
+                         node.fixings + ((k, direction, value),),
+                         (k, direction, frac, bound)))
+    return 'branched'
+
+
+def _node_bounds(relaxation: LinearRelaxation, fixings: tuple) -> tuple:
+    lower = relaxation.default_lower.copy()
+    upper = relaxation.default_upper.copy()
+    for k, direction, value in fixings:
+        if direction == 0:
+            upper[k] = min(upper[k], value)
+        else:
+            lower[k] = max(lower[k], value)
+    return lower, upper
+
+
+def _solve_node(relaxation: LinearRelaxation, fixings: tuple, cuts=None):
+    relaxation.set_bound_vectors(*_node_bounds(relaxation, fixings))
+    if cuts is not None:
+        relaxation.set_cuts(*cuts)
+    lp_result = relaxation.solve()
+    if lp_result.get('status') != 'optimal':
+        return lp_result.get('status'), None, None
+    return ('optimal', lp_result.get('optimal_value'),
+            np.array(lp_result.get('optimal_solution')))
 
-        if val1 > val2:
-            result.update(result1)
+
+def _is_integral(relaxation: LinearRelaxation, solution) -> bool:
+    values = solution[relaxation.integer_index]
+    return bool(np.all(np.abs(values - np.round(values)) <= tolerance))
+
+
+def _round(relaxation: LinearRelaxation, solution):
+    solution = solution.copy()
+    index = relaxation.integer_index
+    solution[index] = np.round(solution[index])
+    return solution
+
+
+def _expired(deadline) -> bool:
+    return deadline is not None and time.perf_counter() >= deadline
+
+
+def _rounding_heuristic(relaxation, lp_solution, lower, upper,
+                        deadline=None):
+    """Round the integer entries of the LP solution."""
+    return _round(relaxation, lp_solution)
+
+
+def _diving_heuristic(relaxation, lp_solution, lower, upper, deadline=None,
+                      max_rounds=20, batch_fraction=.25, near=.1):
+    """Dive towards an integral LP solution. Each round fixes the free
+    integer entries within `near` of an integer, and at least
+    batch_fraction of the fractional ones, to their nearest integers and
+    resolves. If that is infeasible only the least fractional entry is
+    fixed, to its nearest integer or else to the other neighbor. The dive
+    gives up after max_rounds rounds or at the deadline.
+    """
+    lower, upper = lower.copy(), upper.copy()
+    index = relaxation.integer_index
+    solution = lp_solution
+    for _ in range(max_rounds):
+        if _is_integral(relaxation, solution):
+            return _round(relaxation, solution)
+
+        values = solution[index]
+        distances = np.abs(values - np.round(values))
+        free = np.flatnonzero(lower[index] < upper[index])
+        free = free[np.argsort(distances[free], kind='stable')]
+        n_integral = np.count_nonzero(distances[free] <= tolerance)
+        size = max(np.count_nonzero(distances[free] <= near),
+                   n_integral + int(np.ceil(
+                       batch_fraction * (len(free) - n_integral))))
+        batch = index[free[:size]]
+        k = index[free[n_integral:n_integral + 1]]
+        other = np.where(np.round(solution[k]) > solution[k],
+                         np.floor(solution[k]), np.ceil(solution[k]))
+        fixings = [(batch, np.round(solution[batch]))]
+        if len(batch) > 1:
+            fixings.append((k, np.round(solution[k])))
+        fixings.append((k, other))
+
+        for entries, fixed in fixings:
+            if _expired(deadline):
+                return None
+            trial_lower, trial_upper = lower.copy(), upper.copy()
+            trial_lower[entries] = trial_upper[entries] = fixed
+            relaxation.set_bound_vectors(trial_lower, trial_upper)
+            lp_result = relaxation.solve()
+            if lp_result.get('status') == 'optimal':
+                lower, upper = trial_lower, trial_upper
+                solution = np.array(lp_result.get('optimal_solution'))
+                break
         else:
-            result.update(result2)
+            return None
+
+    return _round(relaxation, solution)
+
+
+def _feasibility_pump(relaxation, lp_solution, lower, upper, deadline=None,
+                      max_iterations=20):
+    """Alternate between rounding and the closest point of the relaxation
+    in L1 distance, flipping the most distant entries when cycling, for at
+    most max_iterations iterations or until the deadline.
+    """
+    relaxation.set_bound_vectors(lower, upper)
+    index = relaxation.integer_index
+    solution = lp_solution
+    target = _round(relaxation, solution)
+    for _ in range(max_iterations):
+        if _expired(deadline):
+            return None
+        lp_result = relaxation.solve_closest(target)
+        if lp_result.get('status') != 'optimal':
+            return None
+        solution = np.array(lp_result.get('optimal_solution'))
+        if _is_integral(relaxation, solution):
+            return _round(relaxation, solution)
+
+        new_target = _round(relaxation, solution)
+        if np.array_equal(new_target[index], target[index]):  # cycling
+            distances = np.abs(solution[index] - target[index])
+            flip = index[np.argsort(-distances)[:max(1, len(index) // 10)]]
+            new_target[flip] += np.where(
+                solution[flip] > target[flip], 1, -1)
+            new_target[flip] = np.clip(
+                new_target[flip], lower[flip], upper[flip])
+        target = new_target
+
+    return None
+
+
+_heuristics = {'rounding': _rounding_heuristic,
+               'diving': _diving_heuristic,
+               'feasibility_pump': _feasibility_pump, }
+
+
+def _run_heuristics(state, relaxation: LinearRelaxation, objective,
+                    node: _Node, lp_solution, heuristics, deadline=None):
+    """Try to improve the incumbent from a fractional node LP solution,
+    stopping at the deadline.
+    """
+    if _is_integral(relaxation, lp_solution):
+        return
+
+    lower, upper = _node_bounds(relaxation, node.fixings)
+    for name in heuristics:
+        if _expired(deadline):
+            break
+        solution = _heuristics[name](relaxation, lp_solution, lower, upper,
+                                     deadline)
+        if solution is not None and relaxation.is_feasible(solution):
+            value = state.sense * float(objective.value)
+            if value > state.incumbent:
+                logging.info('Heuristic %s found incumbent: %s', name,
+                             state.sense * value)
+                state.update_incumbent(value, solution)
 
+
+class _CutPool():
+    """Bounded pool of globally valid cuts `a @ x <= b`.
+
+    A cut whose slack stays positive for more than max_age consecutive
+    updates is considered inactive and removed.
+    """
+    def __init__(self, size, max_cuts, max_age=3):
+        self.size = size
+        self.max_cuts = max_cuts
+        self.max_age = max_age
+        self.cuts = []  # [coefficients, rhs, age]
+
+    def __len__(self):
+        return len(self.cuts)
+
+    def add(self, a, b) -> bool:
+        scale = np.max(np.abs(a))
+        if scale <= tolerance:
+            return False
+        a, b = a / scale, b / scale
+        for cut in self.cuts:  # skip duplicates
+            if abs(cut[1] - b) <= 1e-9 and np.allclose(cut[0], a, atol=1e-9):
+                return False
+        if len(self.cuts) >= self.max_cuts:
+            oldest = max(range(len(self.cuts)), key=lambda i: self.cuts[i][2])
+            if not self.cuts[oldest][2]:  # every cut is active
+                return False
+            del self.cuts[oldest]
+        self.cuts.append([a, b, 0])
+        return True
+
+    def update(self, x):
+        """Age the cuts that are slack at x and drop the inactive ones."""
+        for cut in self.cuts:
+            if cut[1] - cut[0] @ x > 1e-6:
+                cut[2] += 1
+            else:
+                cut[2] = 0
+        self.cuts = [cut for cut in self.cuts if cut[2] <= self.max_age]
+
+    def rows(self) -> tuple:
+        if not self.cuts:
+            return np.zeros((0, self.size)), np.zeros(0)
+        return (np.array([cut[0] for cut in self.cuts]),
+                np.array([cut[1] for cut in self.cuts]))
+
+
+class _CutSeparator():
+    """Separates lifted cover, clique and Gomory mixed-integer cuts.
+
+    Knapsack rows are the affine rows (equalities count as two) whose
+    support holds binary entries only. They are complemented to
+    non-negative weights `w @ z <= capacity`, where z_j is x_j or 1 - x_j.
+    """
+    def __init__(self, relaxation: LinearRelaxation, cuts):
+        for name in cuts:
+            if name not in ('cover', 'clique', 'gomory'):
+                raise ValueError('Unknown cut: {}'.format(name))
+        self.cuts = cuts
+        self.relaxation = relaxation
+        self.A_ub, self.b_ub, self.A_eq, self.b_eq = relaxation.linear_rows()
+
+        index = relaxation.integer_index
+        self.binary = np.zeros(relaxation.size, dtype=bool)
+        self.binary[index] = ((relaxation.default_lower[index] == 0) &
+                              (relaxation.default_upper[index] == 1))
+        self.integer = np.zeros(relaxation.size, dtype=bool)
+        self.integer[index] = True
+
+        self.knapsacks = []  # (support, weights, complemented, capacity)
+        for a, b in zip(np.vstack([self.A_ub, self.A_eq, -self.A_eq]),
+                        np.concatenate([self.b_ub, self.b_eq, -self.b_eq])):
+            support = np.flatnonzero(np.abs(a) > tolerance)
+            if not len(support) or not np.all(self.binary[support]):
+                continue
+            weights = a[support]
+            complemented = weights < 0
+            capacity = b - weights[complemented].sum()
+            self.knapsacks.append(
+                (support, np.abs(weights), complemented, capacity))
+
+        # conflict graph between binary entries: x_i + x_j <= 1
+        self.conflicts = collections.defaultdict(set)
+        for support, weights, complemented, capacity in self.knapsacks:
+            items = sorted(
+                [(w, j) for j, w, c in zip(support, weights, complemented)
+                 if not c], reverse=True)
+            for p, (w_i, i) in enumerate(items):
+                for w_j, j in items[p + 1:]:
+                    if w_i + w_j <= capacity + tolerance:
+                        break
+                    self.conflicts[i].add(j)
+                    self.conflicts[j].add(i)
+
+    def separate(self, x, lower, upper, cut_rows, local=False) -> list:
+        """Return cuts (a, b) with a @ x > b. Gomory cuts depend on the
+        node bounds, so they are only separated when not `local`.
+        """
+        cuts = []
+        if 'cover' in self.cuts:
+            cuts += self._covers(x)
+        if 'clique' in self.cuts:
+            cuts += self._cliques(x)
+        if 'gomory' in self.cuts and not local:
+            cuts += self._gomory(x, lower, upper, cut_rows)
+        return [(a, b) for a, b in cuts if a @ x > b + 1e-6]
+
+    def _covers(self, x) -> list:
+        cuts = []
+        for support, weights, complemented, capacity in self.knapsacks:
+            z = np.where(complemented, 1 - x[support], x[support])
+            if weights.sum() <= capacity + tolerance:
+                continue  # no cover exists
+
+            # greedy cover preferring items with z close to 1
+            order = np.argsort((1 - z) / np.maximum(weights, tolerance),
+                               kind='stable')
+            total, cover = 0., []
+            for p in order:
+                cover.append(p)
+                total += weights[p]
+                if total > capacity + tolerance:
+                    break
+            # make the cover minimal, dropping items with small z first
+            for p in sorted(cover, key=lambda p: z[p]):
+                if total - weights[p] > capacity + tolerance:
+                    cover.remove(p)
+                    total -= weights[p]
+
+            # sequence independent lifting: alpha_j = h where
+            # mu_h <= w_j < mu_(h + 1), mu_h the h largest cover weights
+            mu = np.concatenate(
+                [[0.], np.cumsum(np.sort(weights[cover])[::-1])])
+            alpha = np.searchsorted(mu, weights + tolerance, side='right') - 1
+            alpha = np.minimum(alpha, len(cover) - 1).astype(float)
+            alpha[cover] = 1.
+            if alpha @ z <= len(cover) - 1 + 1e-6:
+                continue
+
+            # back to x: z_j = 1 - x_j for complemented entries
+            a = np.zeros(len(x))
+            a[support] = np.where(complemented, -alpha, alpha)
+            b = len(cover) - 1 - alpha[complemented].sum()
+            cuts.append((a, b))
+        return cuts
+
+    def _cliques(self, x) -> list:
+        cuts, seen = [], set()
+        candidates = [j for j in np.argsort(-x, kind='stable')
+                      if self.binary[j] and x[j] > tolerance and
+                      self.conflicts.get(j)]
+        for start in candidates:
+            clique = [start]
+            for j in candidates:
+                if j != start and all(
+                        j in self.conflicts[i] for i in clique):
+                    clique.append(j)
+            if len(clique) < 2 or x[clique].sum() <= 1 + 1e-6:
+                continue
+            # extend with entries at zero to strengthen the cut
+            for j in sorted(self.conflicts[start] - set(clique)):
+                if all(j in self.conflicts[i] for i in clique):
+                    clique.append(j)
+            key = frozenset(clique)
+            if key in seen:
+                continue
+            seen.add(key)
+            a = np.zeros(len(x))
+            a[clique] = 1
+            cuts.append((a, 1.))
+        return cuts
+
+    def _gomory(self, x, lower, upper, cut_rows, max_cuts=10) -> list:
+        """Gomory mixed-integer cuts from the simplex tableau of the vertex
+        x of `[A_ub, I; A_eq, 0] @ [x; s] == [b_ub; b_eq]`, s >= 0.
+
+        The basis is recovered from the entries strictly between their
+        bounds and completed by pivoted QR if x is degenerate. Nothing is
+        returned if x is not a vertex.
+        """
+        A_ub = np.vstack([self.A_ub, cut_rows[0]])
+        b_ub = np.concatenate([self.b_ub, cut_rows[1]])
+        m_ub, m_eq, n = len(b_ub), len(self.b_eq), len(x)
+        m = m_ub + m_eq
+        if not m or m * (n + m_ub) > 1e6:
+            return []
+
+        matrix = np.zeros((m, n + m_ub))
+        matrix[:m_ub, :n] = A_ub
+        matrix[:m_ub, n:] = np.eye(m_ub)
+        matrix[m_ub:, :n] = self.A_eq
+        slack = b_ub - A_ub @ x
+
+        eps = 1e-6
+        at_lower = np.abs(x - lower) <= eps
+        at_upper = ~at_lower & (np.abs(x - upper) <= eps)
+        basic = list(np.flatnonzero(~at_lower & ~at_upper)) + list(
+            n + np.flatnonzero(slack > eps))
+        if len(basic) > m:
+            return []
+        if len(basic) < m:  # degenerate vertex, complete the basis
+            rest = np.setdiff1d(np.arange(n + m_ub), basic)
+            residual = matrix[:, rest]
+            if basic:
+                q, _ = np.linalg.qr(matrix[:, basic])
+                residual = residual - q @ (q.T @ residual)
+            _, r, pivots = scipy.linalg.qr(residual, pivoting=True)
+            extra = m - len(basic)
+            if extra > min(r.shape) or abs(r[extra - 1, extra - 1]) <= eps:
+                return []
+            basic += list(rest[pivots[:extra]])
+        B = matrix[:, basic]
+        if np.linalg.matrix_rank(B) < m:
+            return []
+
+        # the basic solution, the cuts are derived from its fractionality
+        nonbasic = np.setdiff1d(np.arange(n + m_ub), basic)
+        values = np.zeros(n + m_ub)
+        values[:n] = np.where(at_upper, upper, lower)
+        values[nonbasic[nonbasic >= n]] = 0.
+        values[basic] = 0.
+        rhs = np.concatenate([b_ub, self.b_eq]) - matrix @ values
+        values[basic] = np.linalg.solve(B, rhs)
+        if not np.all(np.isfinite(values)) or np.max(
+                np.abs(values - np.concatenate([x, slack]))) > 1e-5:
+            return []  # x is not the vertex of this basis
+        # sign of each nonbasic column in its shifted variable y >= 0
+        signs = np.ones(n + m_ub)
+        signs[:n][at_upper] = -1
+        is_integer = np.zeros(n + m_ub, dtype=bool)
+        is_integer[:n] = self.integer & np.isfinite(
+            np.where(at_upper, upper, lower))
+
+        cuts = []
+        rows = [(r, k) for r, k in enumerate(basic)
+                if k < n and self.integer[k]]
+        rows.sort(key=lambda rk: -min(values[rk[1]] % 1,
+                                      1 - values[rk[1]] % 1))
+        for r, k in rows[:max_cuts]:
+            f0 = values[k] - np.floor(values[k])
+            if not 0.01 <= f0 <= 0.99:
+                continue
+            rho = np.linalg.solve(B.T, np.eye(m)[r])
+            tableau = (rho @ matrix)[nonbasic] * signs[nonbasic]
+
+            f = tableau - np.floor(tableau)
+            pi = np.where(
+                is_integer[nonbasic],
+                np.where(f <= f0, f / f0, (1 - f) / (1 - f0)),
+                np.where(tableau >= 0, tableau / f0, -tableau / (1 - f0)))
+            pi[np.abs(pi) <= 1e-12] = 0.
+
+            # sum pi_j y_j >= 1 with y_j = x_j - l_j, u_j - x_j or
+            # the slack b_i - A_i @ x
+            a, b = np.zeros(n), -1.
+            for j, p in zip(nonbasic, pi):
+                if not p:
+                    continue
+                if j < n:
+                    bound = upper[j] if at_upper[j] else lower[j]
+                    a[j] += p * signs[j]
+                    b -= p * signs[j] * bound
+                else:
+                    a -= p * A_ub[j - n]
+                    b += p * b_ub[j - n]
+            # a @ x + b >= 0, i.e. -a @ x <= b
+            nonzero = np.abs(a[np.abs(a) > 1e-12])
+            if (not len(nonzero) or
+                    nonzero.max() / nonzero.min() > 1e6):
+                continue
+            cuts.append((-a, b))
+        return cuts
+
+
+def _separation_loop(relaxation, separator, pool, fixings, lp_result,
+                     rounds, local, deadline=None):
+    """Add violated cuts to the pool and resolve the node LP until no cut
+    is found, the bound stalls, `rounds` rounds were done or the deadline
+    is reached.
+    """
+    lower, upper = _node_bounds(relaxation, fixings)
+    for _ in range(rounds):
+        lp_status, lp_value, lp_solution = lp_result
+        if (lp_status != 'optimal' or _expired(deadline) or
+                _is_integral(relaxation, lp_solution)):
+            break
+        cuts = separator.separate(lp_solution, lower, upper, pool.rows(),
+                                  local=local)
+        if not [pool.add(a, b) for a, b in cuts].count(True):
+            break
+
+        lp_result = _solve_node(relaxation, fixings, pool.rows())
+        if lp_result[0] == 'optimal':
+            pool.update(lp_result[2])
+            if abs(lp_result[1] - lp_value) <= 1e-6 * max(1, abs(lp_value)):
+                break  # stalled
+    return lp_result
+
+
+_worker_relaxation = None  # per process relaxation for parallel B&B
+
+
+def _init_worker(objective, constraints, max_cuts):
+    global _worker_relaxation
+    _worker_relaxation = LinearRelaxation(
+        cp.Problem(objective, constraints), max_cuts)
+
+
+def _solve_node_in_worker(task: tuple):
+    return _solve_node(_worker_relaxation, *task)
+
+
+def _to_list(solution, integer_index) -> list:
+    """Flat solution as a list with python ints at the integer entries."""
+    result = solution.tolist()
+    for k in integer_index.tolist():
+        result[k] = int(result[k])
     return result
 
 
-def get_minimum_spanning_tree(graph: Graph, key_attr='length') -> Graph:
-    if not graph.edges:
-        return None
+def branch_and_bound(prob: IntegerProblem,
+                     node_selection='best_bound',
+                     branching='most_fractional', workers=1,
+                     time_limit=None, node_limit=None, abs_gap=0.,
+                     rel_gap=0., heuristics=('rounding', 'diving',
+                                             'feasibility_pump'),
+                     heuristic_frequency=None,
+                     cuts=('cover', 'clique', 'gomory'), cut_rounds=5,
+                     cut_frequency=None, max_cuts=50, stats=None) -> dict:
+    """Solve a mixed integer problem by LP based branch and bound.
+
+    Boolean and integer variables of any shape are supported, branching on
+    their individual entries with floor/ceil bounds. The optimal solution
+    is the flat vector described in LinearRelaxation, and the problem
+    variables are left holding the optimal values.
+
+    Open nodes are kept in an explicit queue. node_selection is one of
+    'depth_first', 'best_bound' or 'best_estimate' (bound minus the
+    pseudo-cost estimate of the degradation needed to reach integrality),
+    and branching is 'most_fractional' or 'pseudo_cost'.
+
+    With workers > 1 the node LPs are solved in a process pool. Each round
+    the best `workers` open nodes that survive pruning against the shared
+    incumbent are solved concurrently, and their results are applied in
+    selection order, so the search does not depend on process timing.
+
+    The search stops early after time_limit seconds or node_limit node
+    LPs, or once the incumbent is within abs_gap or rel_gap of the dual
+    bound. The result then holds the best incumbent found, the
+    'dual_bound', the relative 'gap' and the 'termination' reason, one of
+    'completed', 'gap', 'time_limit' or 'node_limit'. A search stopped
+    by a limit has status 'user_limit'.
+
+    The primal heuristics in `heuristics` ('rounding', 'diving' and
+    'feasibility_pump') run on the root LP solution, and on every
+    heuristic_frequency-th node if given, to find incumbents early. They
+    and the cut rounds below do a bounded number of LP solves each and
+    stop at the time limit.
+
+    The relaxation is tightened by up to cut_rounds rounds of the cuts in
+    `cuts` ('cover', 'clique' and 'gomory') at the root, and on every
+    cut_frequency-th node if given. Cuts are kept in a pool of at most
+    max_cuts globally valid cuts shared by all nodes; Gomory cuts depend
+    on the node bounds and are therefore only separated at the root.
 
+    Node counts, the time spent in node LPs (waiting for the workers if
+    workers > 1), cuts and heuristics, the depth and the incumbent and
+    bound over time are added to `stats`, a SolverStats, if given.
+    """
+    for name in heuristics:
+        if name not in _heuristics:
+            raise ValueError('Unknown heuristic: {}'.format(name))
+    start_time = time.perf_counter()
+    deadline = None if time_limit is None else start_time + time_limit
+    if not cuts:
+        max_cuts = 0
+
+    # the relaxation is canonicalized once, nodes only change bounds
+    if isinstance(prob, IntegerProblem):
+        relaxation = prob.relaxation(max_cuts)
+    else:
+        relaxation = LinearRelaxation(prob, max_cuts)
+    separator = pool = None
+    if max_cuts:
+        separator = _CutSeparator(relaxation, cuts)
+        pool = _CutPool(relaxation.size, max_cuts)
+    sense = 1 if isinstance(prob.objective, cp.Maximize) else -1
+    state = _BranchAndBoundState(sense, node_selection, abs_gap, rel_gap)
+    state.push(_Node(np.inf, np.inf, 0, ()))
+
+    executor = None
+    if workers > 1:
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker,
+            initargs=(prob.objective, prob.constraints, max_cuts))
+
+    def record(event, value):
+        if stats is not None and np.isfinite(value):
+            stats.record(event, sense * state.incumbent,
+                         sense * state.dual_bound())
+
+    root_status = None
+    n_nodes = 0
+    n_processed = 0
+    termination = 'completed'
+    last_bound = np.inf
+    try:
+        while state.nodes:
+            if stats is not None and state.dual_bound() != last_bound:
+                last_bound = state.dual_bound()
+                record('bound', last_bound)
+            if (state.incumbent_solution is not None and
+                    state.dual_bound() <= state.prune_threshold()):
+                termination = 'gap'
+                break
+            if _expired(deadline):
+                termination = 'time_limit'
+                break
+            if node_limit is not None and n_nodes >= node_limit:
+                termination = 'node_limit'
+                break
+
+            batch_size = workers
+            if node_limit is not None:
+                batch_size = min(batch_size, node_limit - n_nodes)
+            batch = []
+            while state.nodes and len(batch) < batch_size:
+                node = state.pop()
+                if node.bound > state.prune_threshold():
+                    batch.append(node)
+                elif stats is not None:  # fathom: bound
+                    stats.count('nodes_pruned')
+            n_nodes += len(batch)
+
+            # Bound
+            cut_rows = pool.rows() if pool is not None else None
+            if executor is not None:
+                lp_results = executor.map(
+                    _solve_node_in_worker,
+                    [(n.fixings, cut_rows) for n in batch])
+            else:
+                lp_results = (_solve_node(relaxation, n.fixings, cut_rows)
+                              for n in batch)
+
+            lp_results = iter(lp_results)
+            for node in batch:
+                # the LPs are solved lazily (or awaited) by next
+                lap = time.perf_counter()
+                lp_result = next(lp_results)
+                if stats is not None:
+                    stats.add_time('lp', time.perf_counter() - lap)
+                    stats.count('nodes_explored')
+                    stats.max_depth = max(stats.max_depth, node.depth)
+                if root_status is None:
+                    root_status = lp_result[0]
+                if lp_result[0] != 'optimal':  # fathom: lp infeasible
+                    _count(stats, nodes_infeasible=1)
+                    continue
+
+                n_processed += 1
+                incumbent = state.incumbent
+                if separator is not None and (node.depth == 0 or (
+                        cut_frequency and
+                        n_processed % cut_frequency == 0)):
+                    lap = time.perf_counter()
+                    lp_result = _separation_loop(
+                        relaxation, separator, pool, node.fixings,
+                        lp_result, cut_rounds, local=node.depth > 0,
+                        deadline=deadline)
+                    if stats is not None:
+                        stats.add_time('cuts', time.perf_counter() - lap)
+                lp_status, lp_value, lp_solution = lp_result
+                if lp_status != 'optimal':  # cuts proved it infeasible
+                    _count(stats, nodes_infeasible=1)
+                    continue
+                if heuristics and (node.depth == 0 or (
+                        heuristic_frequency and
+                        n_processed % heuristic_frequency == 0)):
+                    lap = time.perf_counter()
+                    _run_heuristics(state, relaxation, prob.objective, node,
+                                    lp_solution, heuristics, deadline)
+                    if stats is not None:
+                        stats.add_time('heuristics',
+                                       time.perf_counter() - lap)
+
+                outcome = _process_node(
+                    state, node, sense * lp_value, lp_solution,
+                    relaxation.integer_index, branching)
+                if stats is not None:
+                    stats.count('nodes_' + outcome)
+                    if state.incumbent > incumbent:
+                        stats.count('incumbents')
+                        record('incumbent', state.incumbent)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if stats is not None:
+            stats.add_time('total', time.perf_counter() - start_time)
+
+    if termination in ('completed', 'gap'):
+        status = 'optimal'
+    else:
+        status = 'user_limit'
+    if state.incumbent_solution is not None:
+        # evaluate the objective exactly at the rounded incumbent
+        relaxation.set_solution(state.incumbent_solution)
+        state.incumbent = sense * float(prob.objective.value)
+
+    result = {'status': None,
+              'optimal_value': None,
+              'optimal_solution': None,
+              'dual_bound': sense * state.dual_bound(),
+              'gap': state.gap(),
+              'termination': termination, }
+    if state.incumbent_solution is not None:
+        result.update(
+            {'status': status,
+             'optimal_value': sense * state.incumbent,
+             'optimal_solution': _to_list(
+                 state.incumbent_solution, relaxation.integer_index), })
+    else:
+        if status == 'optimal':
+            status = (root_status if root_status != 'optimal'
+                      else 'infeasible')
+        result.update(
+            {'status': status,
+             'optimal_value': -sense * np.inf, })
+
+    if stats is not None:
+        if state.dual_bound() != last_bound:
+            record('bound', state.dual_bound())
+        stats.notify('finish')
+    return result
+
+
+def _prim(graph, key_attr: str, stats=None) -> Graph:
+    out_arcs, in_arcs = _out_arcs(graph, key_attr), _in_arcs(graph, key_attr)
+    tree = Graph()
     explored = set()
-    source = list(graph.vertices)[0]  # pick arbitrary source node
-    explored.add(source)
+    counter = itertools.count()  # tie breaker, edges do not compare
+    n_pops = n_relaxed = 0
+
+    for root in _vertex_keys(graph):  # one tree per connected component
+        if root in explored:
+            continue
+        explored.add(root)
+
+        heap = []
+        u = root
+        while True:
+            for arcs in (out_arcs, in_arcs):  # edge directions are ignored
+                for v, weight, edge in arcs(u):
+                    n_relaxed += 1
+                    if v not in explored:
+                        heapq.heappush(heap, (weight, next(counter), v, edge))
+
+            while heap and heap[0][2] in explored:  # stale entries
+                heapq.heappop(heap)
+                n_pops += 1
+            if not heap:
+                break
+
+            _, _, u, best_edge = heapq.heappop(heap)
+            n_pops += 1
+            explored.add(u)
+            tree.add_edge(_tree_edge(graph, best_edge))
+
+    _count(stats, heap_pushes=next(counter), heap_pops=n_pops,
+           edges_relaxed=n_relaxed, vertices_settled=len(explored))
+    return tree
+
+
+def _find(parents: dict, x):
+    root = x
+    while parents[root] != root:
+        root = parents[root]
+    while parents[x] != root:  # path compression
+        parents[x], x = root, parents[x]
+    return root
+
+
+def _kruskal(graph, key_attr: str, stats=None) -> Graph:
+    if isinstance(graph, CSRGraph):
+        weights = graph.edge_attrs[key_attr]
+        order = np.argsort(weights, kind='stable')
+        candidates = zip(graph.sources[order].tolist(),
+                         graph.targets[order].tolist(), order.tolist())
+    else:
+        edges = [e for out in graph._out.values() for e in out.values()]
+        candidates = ((e.source.name, e.target.name, e) for e in sorted(
+            edges, key=lambda x: getattr(x, key_attr)))
 
     tree = Graph()
-    while graph.vertices - explored:
-    
-        candidates = []
-        for edge in graph.edges:
-            if (edge.source in explored and
-                    edge.target not in explored):  # crosses frontier
-                candidates.append(edge)
-        logging.info('Candidates edges: {}'.format(candidates))
+    parents = dict((u, u) for u in _vertex_keys(graph))
+    ranks = dict.fromkeys(parents, 0)
+
+    n_relaxed = 0
+    for s, t, edge in candidates:
+        n_relaxed += 1
+        root_s, root_t = _find(parents, s), _find(parents, t)
+        if root_s == root_t:
+            continue
 
-        best_edge = min(candidates, key=lambda x: getattr(x, key_attr))
-        logging.info('Best edge: {}'.format(best_edge))
+        if ranks[root_s] < ranks[root_t]:  # union by rank
+            root_s, root_t = root_t, root_s
+        parents[root_t] = root_s
+        if ranks[root_s] == ranks[root_t]:
+            ranks[root_s] += 1
 
-        best_attr = getattr(best_edge, key_attr)
-        logging.info('Best length: {}'.format(best_attr))
+        tree.add_edge(_tree_edge(graph, edge))
 
-        logging.info('Adding {} to tree'.format(best_edge))
-        tree.add_edge(best_edge)
+    _count(stats, edges_relaxed=n_relaxed, union_finds=2 * n_relaxed)
+    return tree
+
+
+def _tree_edge(graph, edge):
+    if isinstance(graph, CSRGraph):
+        edge = graph.to_edge(edge)
+    logging.info('Adding %s to tree', edge)
+    return edge
 
-        logging.info('Marking {} as explored'.format(best_edge.target))
-        explored.add(best_edge.target)
 
+def get_minimum_spanning_tree(graph, key_attr='length',
+                              algorithm='prim', stats=None) -> Graph:
+    """Get a minimum spanning tree of the graph, ignoring edge directions.
+
+    graph is a Graph or its CSRGraph snapshot. If the graph is disconnected
+    a minimum spanning forest is returned. algorithm is either 'prim'
+    (binary heap) or 'kruskal' (union-find). Heap or union-find
+    operations and the time taken are added to `stats`, a SolverStats, if
+    given.
+    """
+    if isinstance(graph, CSRGraph):
+        if not graph.n_edges:
+            return None
+    elif not graph.edges:
+        return None
+
+    start_time = time.perf_counter()
+    if algorithm == 'prim':
+        tree = _prim(graph, key_attr, stats)
+    elif algorithm == 'kruskal':
+        tree = _kruskal(graph, key_attr, stats)
+    else:
+        raise ValueError('Unknown algorithm: {}'.format(algorithm))
+    if stats is not None:
+        stats.add_time('total', time.perf_counter() - start_time)
+        stats.notify('finish')
     return tree
+
+
+def _edge_arrays(graph, attrs: dict) -> tuple:
+    """Integer arrays of a Graph or CSRGraph for the flow algorithms.
+
+    Returns (names, sources, targets, values), where `values` maps each
+    attribute of `attrs` to a float array over the edges, filled with
+    the default attrs[attr] where an edge lacks it. Edge k runs from
+    names[sources[k]] to names[targets[k]].
+    """
+    if isinstance(graph, CSRGraph):
+        values = dict(
+            (attr, np.where(np.isnan(graph.edge_attrs[attr]), default,
+                            graph.edge_attrs[attr])
+             if attr in graph.edge_attrs else
+             np.full(graph.n_edges, default, dtype=float))
+            for attr, default in attrs.items())
+        return (graph.names, graph.sources.copy(), graph.targets.copy(),
+                values)
+
+    names = tuple(graph._vertices)
+    ids = dict((name, i) for i, name in enumerate(names))
+    edges = [e for out in graph._out.values() for e in out.values()]
+    sources = np.array([ids[e.source.name] for e in edges], dtype=np.int64)
+    targets = np.array([ids[e.target.name] for e in edges], dtype=np.int64)
+    values = dict(
+        (attr, np.array([e.attrs.get(attr, default) for e in edges],
+                        dtype=float))
+        for attr, default in attrs.items())
+    return names, sources, targets, values
+
+
+class _Residual():
+    """Residual network with arcs 2k (edge k) and 2k + 1 (its reverse).
+
+    Arcs are stored as plain lists, `out[u]` lists the arcs leaving u.
+    """
+    def __init__(self, n, sources, targets, capacities):
+        m = len(sources)
+        self.n = n
+        self.head = np.empty(2 * m, dtype=np.int64)
+        self.head[0::2], self.head[1::2] = targets, sources
+        self.head = self.head.tolist()
+        self.capacity = np.zeros(2 * m)
+        self.capacity[0::2] = capacities
+        self.residual = self.capacity.tolist()
+        self.out = [[] for _ in range(n)]
+        for k, (u, v) in enumerate(zip(sources.tolist(), targets.tolist())):
+            self.out[u].append(2 * k)
+            self.out[v].append(2 * k + 1)
+        self.eps = tolerance * max(1., np.max(capacities, initial=0))
+
+    def levels(self, source, reverse=False) -> list:
+        """BFS distances from source over arcs with residual capacity (to
+        source over such arcs if reverse), -1 if unreachable."""
+        head, residual, eps = self.head, self.residual, self.eps
+        level = [-1] * self.n
+        level[source] = 0
+        queue = collections.deque([source])
+        while queue:
+            u = queue.popleft()
+            for a in self.out[u]:
+                v = head[a]
+                if level[v] < 0 and residual[a ^ 1 if reverse else a] > eps:
+                    level[v] = level[u] + 1
+                    queue.append(v)
+        return level
+
+    def push(self, a, delta):
+        self.residual[a] -= delta
+        self.residual[a ^ 1] += delta
+
+    def flows(self) -> np.ndarray:
+        return self.capacity[0::2] - np.array(self.residual[0::2])
+
+
+def _dinic(network: _Residual, source, target):
+    """Blocking flows on the BFS level graph until the target is cut off.
+
+    The DFS is iterative with current-arc pointers; after an augmentation
+    it resumes from the tail of the first saturated arc.
+    """
+    head, residual, out, eps = (network.head, network.residual,
+                                network.out, network.eps)
+    while True:
+        level = network.levels(source)
+        if level[target] < 0:
+            return
+        pointer = [0] * network.n
+        path = []
+        u = source
+        while True:
+            if u == target:
+                delta = min(residual[a] for a in path)
+                for a in path:
+                    network.push(a, delta)
+                for i, a in enumerate(path):
+                    if residual[a] <= eps:
+                        u = head[a ^ 1]
+                        del path[i:]
+                        break
+                continue
+            arcs = out[u]
+            while pointer[u] < len(arcs):
+                a = arcs[pointer[u]]
+                if residual[a] > eps and level[head[a]] == level[u] + 1:
+                    break
+                pointer[u] += 1
+            if pointer[u] < len(arcs):
+                path.append(arcs[pointer[u]])
+                u = head[path[-1]]
+            elif path:  # dead end, retreat
+                level[u] = -1
+                u = head[path.pop() ^ 1]
+                pointer[u] += 1
+            else:
+                break
+
+
+def _push_relabel(network: _Residual, source, target):
+    """Highest-label push-relabel with the gap heuristic.
+
+    Heights start as exact distances to the target. When no vertex is
+    left at some height below n, the vertices above it cannot reach the
+    target any more and are lifted to n + 1 at once, so their excess
+    goes back to the source.
+    """
+    n = network.n
+    head, residual, out, eps = (network.head, network.residual,
+                                network.out, network.eps)
+    height = network.levels(target, reverse=True)
+    height = [h if h >= 0 else n + 1 for h in height]
+    height[source] = n
+    count = [0] * (2 * n + 1)
+    for h in height:
+        count[h] += 1
+    excess = [0.] * n
+    pointer = [0] * n
+    buckets = [[] for _ in range(2 * n + 1)]  # active vertices by height
+    top = 0
+
+    for a in out[source]:
+        excess[head[a]] += residual[a]
+        network.push(a, residual[a])
+    for v in range(n):
+        if v not in (source, target) and excess[v] > eps:
+            buckets[height[v]].append(v)
+            top = max(top, height[v])
+
+    while top >= 0:
+        if not buckets[top]:
+            top -= 1
+            continue
+        u = buckets[top].pop()
+        if height[u] != top or excess[u] <= eps:
+            continue  # stale entry
+
+        # discharge u
+        arcs = out[u]
+        while excess[u] > eps:
+            if pointer[u] < len(arcs):
+                a = arcs[pointer[u]]
+                v = head[a]
+                if residual[a] > eps and height[u] == height[v] + 1:
+                    delta = min(excess[u], residual[a])
+                    network.push(a, delta)
+                    excess[u] -= delta
+                    if v not in (source, target) and excess[v] <= eps:
+                        buckets[height[v]].append(v)
+                    excess[v] += delta
+                else:
+                    pointer[u] += 1
+                continue
+
+            # relabel
+            old = height[u]
+            height[u] = 1 + min(height[head[a]] for a in arcs
+                                if residual[a] > eps)
+            pointer[u] = 0
+            count[old] -= 1
+            count[height[u]] += 1
+            if not count[old] and old < n:  # gap
+                for v in range(n):
+                    if old < height[v] < n:
+                        count[height[v]] -= 1
+                        height[v] = n + 1
+                        count[n + 1] += 1
+                        if excess[v] > eps and v != u:
+                            buckets[n + 1].append(v)
+                            top = max(top, n + 1)
+                if height[u] < n:
+                    count[height[u]] -= 1
+                    height[u] = n + 1
+                    count[n + 1] += 1
+            top = max(top, height[u])
+
+
+def get_max_flow(graph, source_name: str, target_name: str,
+                 capacity_attr='capacity_tons', algorithm='dinic') -> dict:
+    """Get a maximum flow from source to target and a minimum cut.
+
+    graph is a Graph or its CSRGraph snapshot. Edges without the capacity
+    attribute are uncapacitated (np.inf). algorithm is 'dinic' or
+    'push_relabel' (highest label with the gap heuristic).
+
+    Returns the status ('optimal', or 'unbounded' if an uncapacitated
+    path joins source and target), the flow value, the flow per edge
+    keyed by (source name, target name), the vertex names on the source
+    side of the minimum cut and the saturated edges crossing it.
+    """
+    if algorithm == 'dinic':
+        solve = _dinic
+    elif algorithm == 'push_relabel':
+        solve = _push_relabel
+    else:
+        raise ValueError('Unknown algorithm: {}'.format(algorithm))
+
+    names, sources, targets, values = _edge_arrays(
+        graph, {capacity_attr: np.inf})
+    capacities = values[capacity_attr]
+    if (capacities < 0).any() or np.isnan(capacities).any():
+        raise ValueError('Capacities must be non-negative.')
+    ids = dict((name, i) for i, name in enumerate(names))
+    if source_name not in ids or target_name not in ids:
+        raise KeyError('The requested vertex does not exist!')
+    source, target = ids[source_name], ids[target_name]
+    if source == target:
+        raise ValueError('Source and target must differ.')
+    result = {'status': None,
+              'optimal_value': None,
+              'optimal_solution': None,
+              'source_side': None,
+              'cut_edges': None, }
+
+    # without an uncapacitated path, every cut of uncapacitated edges
+    # costs more than all finite capacities together
+    infinite = np.isinf(capacities)
+    if infinite.any():
+        uncapacitated = _Residual(len(names), sources[infinite],
+                                  targets[infinite], np.ones(infinite.sum()))
+        if uncapacitated.levels(source)[target] >= 0:
+            result.update({'status': 'unbounded', 'optimal_value': np.inf})
+            return result
+        capacities = np.where(infinite, capacities[~infinite].sum() + 1,
+                              capacities)
+
+    network = _Residual(len(names), sources, targets, capacities)
+    solve(network, source, target)
+
+    flows = network.flows()
+    reachable = np.array(network.levels(source)) >= 0
+    cut = reachable[sources] & ~reachable[targets]
+    keys = [(names[u], names[v]) for u, v in zip(sources, targets)]
+    result.update(
+        {'status': 'optimal',
+         'optimal_value': float(flows[cut].sum()),
+         'optimal_solution': dict(zip(keys, flows.tolist())),
+         'source_side': set(np.array(names, dtype=object)[reachable]),
+         'cut_edges': [key for key, c in zip(keys, cut) if c], })
+    return result
+
+
+def _vertex_values(graph, names, attr, default=0.) -> np.ndarray:
+    if isinstance(graph, CSRGraph):
+        if attr in graph.vertex_attrs:
+            return np.where(np.isnan(graph.vertex_attrs[attr]), default,
+                            graph.vertex_attrs[attr])
+        return np.full(len(names), default)
+    return np.array([graph._vertices[name].attrs.get(attr, default)
+                     for name in names], dtype=float)
+
+
+def _has_negative_cycle(n, sources, targets, costs) -> bool:
+    """Vectorized Bellman-Ford from a virtual source joined to every
+    vertex."""
+    dists = np.zeros(n)
+    for _ in range(n):
+        relaxed = dists.copy()
+        np.minimum.at(relaxed, targets, dists[sources] + costs)
+        if np.array_equal(relaxed, dists):
+            return False
+        dists = relaxed
+    return True
+
+
+def _admissible_flow(network: _Residual, costs, potentials, excess,
+                     cost_eps, settled):
+    """Blocking flows from the vertices with excess to those with a deficit
+    over the arcs of zero reduced cost between `settled` vertices (those
+    reached by the last Dijkstra), as in Dinic's algorithm."""
+    n = network.n
+    head, residual, eps = network.head, network.residual, network.eps
+
+    # arcs of zero reduced cost, listed by tail
+    heads = np.array(head)
+    tails = heads[np.arange(len(heads)) ^ 1]
+    potentials = np.array(potentials)
+    zero = np.flatnonzero(
+        (costs + potentials[tails] - potentials[heads] <= cost_eps) &
+        settled[tails] & settled[heads])
+    zero = zero[np.argsort(tails[zero], kind='stable')]
+    splits = np.searchsorted(tails[zero], np.arange(1, n))
+    out = [arcs.tolist() for arcs in np.split(zero, splits)]
+
+    while True:
+        sources = [u for u in range(n) if excess[u] > eps]
+        level = [-1] * n
+        for u in sources:
+            level[u] = 0
+        queue = collections.deque(sources)
+        reached = n  # level of the nearest deficit, deeper ones wait
+        while queue:
+            u = queue.popleft()
+            if excess[u] < -eps:
+                reached = min(reached, level[u])
+            if level[u] >= reached:
+                continue
+            for a in out[u]:
+                v = head[a]
+                if level[v] < 0 and residual[a] > eps:
+                    level[v] = level[u] + 1
+                    queue.append(v)
+        if reached == n:
+            return
+
+        pointer = [0] * n
+        for source in sources:
+            path = []
+            u = source
+            while excess[source] > eps:
+                if excess[u] < -eps:
+                    delta = min([excess[source], -excess[u]] +
+                                [residual[a] for a in path])
+                    for a in path:
+                        network.push(a, delta)
+                    excess[source] -= delta
+                    excess[u] += delta
+                    path, u = [], source
+                    continue
+                arcs = out[u]
+                while pointer[u] < len(arcs):
+                    a = arcs[pointer[u]]
+                    if (level[head[a]] == level[u] + 1 and
+                            residual[a] > eps):
+                        break
+                    pointer[u] += 1
+                if pointer[u] < len(arcs):
+                    path.append(arcs[pointer[u]])
+                    u = head[path[-1]]
+                elif path:  # dead end, retreat
+                    level[u] = -1
+                    u = head[path.pop() ^ 1]
+                    pointer[u] += 1
+                else:
+                    break
+
+
+def _successive_shortest_paths(network: _Residual, costs, excess):
+    """Route the excess along shortest residual paths until every vertex
+    is balanced.
+
+    Each phase runs Dijkstra on the reduced costs c + p_u - p_v, which the
+    potentials p keep non-negative, from all vertices with excess at once.
+    Adding the distances to the potentials gives every shortest path zero
+    reduced cost, and all of them are augmented together; augmenting along
+    zero reduced cost paths keeps the reduced costs non-negative.
+
+    Returns the potentials and, if some excess cannot be routed, the mask
+    of the vertices reachable from the vertices with excess.
+    """
+    n = network.n
+    head, residual, out, eps = (network.head, network.residual,
+                                network.out, network.eps)
+    cost_array = np.array(costs)
+    cost_eps = tolerance * max(1., np.abs(cost_array).max(initial=0))
+    potentials = [0.] * n
+    while True:
+        sources = [u for u in range(n) if excess[u] > eps]
+        if not sources:
+            return np.array(potentials), None
+
+        dists = [np.inf] * n
+        settled = [False] * n
+        heap = []
+        for u in sources:
+            dists[u] = 0.
+            heap.append((0., u))
+        heapq.heapify(heap)
+        while heap:
+            dist, u = heapq.heappop(heap)
+            if settled[u]:
+                continue
+            settled[u] = True
+            for a in out[u]:
+                v = head[a]
+                if residual[a] > eps and not settled[v]:
+                    reduced = costs[a] + potentials[u] - potentials[v]
+                    dist_v = dist + max(reduced, 0.)
+                    if dist_v < dists[v]:
+                        dists[v] = dist_v
+                        heapq.heappush(heap, (dist_v, v))
+        if not any(excess[u] < -eps for u in range(n) if settled[u]):
+            return np.array(potentials), np.array(settled)
+
+        farthest = max(d for d in dists if d < np.inf)
+        potentials = [p + min(d, farthest)
+                      for p, d in zip(potentials, dists)]
+        _admissible_flow(network, cost_array, potentials, excess, cost_eps,
+                         np.array(settled))
+
+
+def get_min_cost_flow(graph, supply_attr='b', cost_attr='cost',
+                      capacity_attr='capacity_tons') -> dict:
+    """Get a minimum cost flow meeting the supplies and demands.
+
+    graph is a Graph or its CSRGraph snapshot. The vertex attribute
+    supply_attr is the net supply (negative for a demand, 0 if missing)
+    and edges carry a unit cost and an optional capacity (np.inf if
+    missing). Solved by successive shortest paths with potentials, after
+    saturating the negative cost edges.
+
+    Returns the status ('optimal', 'infeasible' or 'unbounded'), the
+    optimal value, the flow per edge keyed by (source name, target name),
+    the vertex 'potentials' p, such that the reduced cost
+    c_uv + p_u - p_v is >= 0 on edges below capacity and <= 0 on edges
+    carrying flow, and a 'message' explaining an infeasible or unbounded
+    problem.
+    """
+    names, sources, targets, values = _edge_arrays(
+        graph, {cost_attr: 0., capacity_attr: np.inf})
+    costs, capacities = values[cost_attr], values[capacity_attr]
+    supplies = _vertex_values(graph, names, supply_attr)
+    if (capacities < 0).any() or np.isnan(capacities).any():
+        raise ValueError('Capacities must be non-negative.')
+    if not np.all(np.isfinite(costs)) or not np.all(np.isfinite(supplies)):
+        raise ValueError('Costs and supplies must be finite.')
+    n = len(names)
+    result = {'status': None,
+              'optimal_value': None,
+              'optimal_solution': None,
+              'potentials': None,
+              'message': None, }
+
+    scale = max(1., np.abs(supplies).max(initial=0))
+    if abs(supplies.sum()) > tolerance * scale * n:
+        result.update(
+            {'status': 'infeasible',
+             'message': 'Supplies sum to {} instead of 0.'.format(
+                 supplies.sum())})
+        return result
+
+    infinite = np.isinf(capacities)
+    # some optimal flow routes each unit of supply once and goes around
+    # each negative cycle at most up to its finite capacity
+    bound = np.abs(supplies).sum() + capacities[~infinite].sum() + 1
+    bounded = np.where(infinite, bound, capacities)
+
+    network = _Residual(n, sources, targets, bounded)
+    arc_costs = np.empty(2 * len(costs))
+    arc_costs[0::2], arc_costs[1::2] = costs, -costs
+    arc_costs = arc_costs.tolist()
+
+    # saturate the negative cost edges so all residual costs are >= 0
+    excess = supplies.copy()
+    for k in np.flatnonzero(costs < 0).tolist():
+        network.push(2 * k, bounded[k])
+        excess[sources[k]] -= bounded[k]
+        excess[targets[k]] += bounded[k]
+    excess = excess.tolist()
+
+    potentials, stuck = _successive_shortest_paths(
+        network, arc_costs, excess)
+    if stuck is not None:
+        leaving = stuck[sources] & ~stuck[targets]
+        result.update(
+            {'status': 'infeasible',
+             'message': 'Vertices {} have a net supply of {} but the '
+                        'edges leaving them carry at most {}.'.format(
+                            sorted(np.array(names, dtype=object)[stuck]),
+                            supplies[stuck].sum(),
+                            capacities[leaving].sum())})
+        return result
+    if _has_negative_cycle(n, sources[infinite], targets[infinite],
+                           costs[infinite]):
+        result.update(
+            {'status': 'unbounded',
+             'optimal_value': -np.inf,
+             'message': 'A negative cost cycle is uncapacitated.'})
+        return result
+
+    flows = network.flows()
+    keys = [(names[u], names[v]) for u, v in zip(sources, targets)]
+    result.update(
+        {'status': 'optimal',
+         'optimal_value': float(costs @ flows),
+         'optimal_solution': dict(zip(keys, flows.tolist())),
+         'potentials': dict(zip(names, potentials.tolist())), })
+    return result
+
+
+def _flat_values(items) -> np.ndarray:
+    """Concatenate the row major values of parameters or variables, with
+    nan entries for items without a value.
+    """
+    return np.concatenate(
+        [np.full(x.size, np.nan) if x.value is None
+         else np.ravel(x.value, order='C') for x in items]
+        + [np.zeros(0)])
+
+
+def _set_flat_values(parameters, row):
+    offset = 0
+    for p in parameters:
+        value = row[offset:offset + p.size]
+        p.value = value.reshape(p.shape, order='C') if p.shape else value[0]
+        offset += p.size
+
+
+def _sweep_chain(prob, parameters, rows, warm_start, solve_kwargs) -> tuple:
+    """Solve prob for each row of parameter values in turn, each solve
+    warm started from the previous one.
+    """
+    variables = prob.variables()
+    statuses = []
+    values = np.full(len(rows), np.nan)
+    solutions = np.full((len(rows), sum(v.size for v in variables)), np.nan)
+    for i, row in enumerate(rows):
+        _set_flat_values(parameters, row)
+        try:
+            prob.solve(warm_start=warm_start, **solve_kwargs)
+        except cp.error.SolverError:
+            if not warm_start:
+                statuses.append('solver_error')
+                continue
+            try:  # some solvers fail to restart from a stale point
+                prob.solve(warm_start=False, **solve_kwargs)
+            except cp.error.SolverError:
+                statuses.append('solver_error')
+                continue
+        statuses.append(prob.status)
+        if prob.status in ('optimal', 'optimal_inaccurate'):
+            values[i] = prob.value
+            solutions[i] = _flat_values(variables)
+        elif prob.value is not None:  # +-inf if infeasible or unbounded
+            values[i] = prob.value
+    return statuses, values, solutions
+
+
+_worker_sweep = None  # per process problem for parallel sweeps
+
+
+def _init_sweep_worker(objective, constraints, parameter_ids, warm_start,
+                       solve_kwargs):
+    global _worker_sweep
+    prob = cp.Problem(objective, constraints)
+    parameters = {p.id: p for p in prob.parameters()}
+    _worker_sweep = (prob, [parameters[i] for i in parameter_ids],
+                     warm_start, solve_kwargs)
+
+
+def _sweep_chain_in_worker(rows) -> tuple:
+    prob, parameters, warm_start, solve_kwargs = _worker_sweep
+    return _sweep_chain(prob, parameters, rows, warm_start, solve_kwargs)
+
+
+def parameter_sweep(prob: cp.problems.problem.Problem, parameters, values,
+                    workers=1, warm_start=True, **solve_kwargs) -> dict:
+    """Solve prob for every vector of parameter values.
+
+    values is a (k, n) array (or list of vectors), each row holding the
+    row major values of the given parameters one after the other, e.g.
+    from utils.parameter_grid. The rows are solved in order as a warm
+    started chain, reusing the problem's compiled form; with workers > 1
+    the rows are split into contiguous chains solved in a process pool.
+    Other keyword arguments are passed to prob.solve. The parameters are
+    restored to their original values afterwards.
+
+    Returns a dict of arrays: 'status', 'optimal_value' (nan if the solver
+    failed) and 'optimal_solution', the (k, n_variables) row major values
+    of prob.variables() (nan unless optimal).
+    """
+    parameters = list(parameters)
+    size = sum(p.size for p in parameters)
+    rows = np.asarray(values, dtype=float)
+    if rows.ndim == 1 and size == 1:
+        rows = rows[:, None]
+    if rows.ndim != 2 or rows.shape[1] != size:
+        raise ValueError('Expected a (k, {}) array of parameter values.'
+                         .format(size))
+    known = {p.id for p in prob.parameters()}
+    for p in parameters:
+        if p.id not in known:
+            raise ValueError('{} is not a parameter of the problem.'
+                             .format(p.name()))
+
+    chunks = min(workers, len(rows))
+    if chunks > 1:
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_sweep_worker,
+                initargs=(prob.objective, prob.constraints,
+                          [p.id for p in parameters], warm_start,
+                          solve_kwargs)) as executor:
+            results = list(executor.map(_sweep_chain_in_worker,
+                                        np.array_split(rows, chunks)))
+        statuses = [s for result in results for s in result[0]]
+        optimal_values = np.concatenate([result[1] for result in results])
+        solutions = np.concatenate([result[2] for result in results])
+    else:
+        original = [p.value for p in parameters]
+        try:
+            statuses, optimal_values, solutions = _sweep_chain(
+                prob, parameters, rows, warm_start, solve_kwargs)
+        finally:
+            for p, value in zip(parameters, original):
+                if value is not None:
+                    p.value = value
+
+    return {'status': np.array(statuses, dtype=object),
+            'optimal_value': optimal_values,
+            'optimal_solution': solutions}
@@ -1,35 +1,92 @@
 import cvxpy as cp
+import numpy as np
+import scipy.sparse
+
+import collections
+import itertools
+import numbers
+import os
+import pickle
+import tempfile
+import time
 
 from abc import ABC, abstractmethod
 
 
 class Vertex():
+    """A named vertex. Attributes other than the name live in `attrs` and
+    are readable and writable as plain attributes.
+
+    A vertex belongs to at most one Graph, the first one it is added to;
+    other graphs add a copy of it. Setting an attribute bumps the version
+    of its graph (changes made to `attrs` directly are not tracked).
+    """
+    __slots__ = ('name', 'attrs', '_hash', '_graph')
+
     def __init__(self, name: str, **kwargs):
-        self.name = name
-        for k, v in kwargs.items():
-            self.__dict__[k] = v
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'attrs', kwargs)
+        object.__setattr__(self, '_hash', hash(name))
+        object.__setattr__(self, '_graph', None)  # owner graph
+
+    def __getattr__(self, name):
+        if name in Vertex.__slots__:  # slot not set yet, e.g. unpickling
+            raise AttributeError(name)
+        try:
+            return self.attrs[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in Vertex.__slots__:
+            raise AttributeError('{} is read-only'.format(name))
+        self.attrs[name] = value
+        self._changed()
 
     def __eq__(self, other):
-        if self.name == other.name:
-            return True
-        else:
-            return False
+        if not isinstance(other, Vertex):
+            return NotImplemented
+        return self.name == other.name
 
     def __str__(self):
         return 'Vertex: {}'.format(self.name)
 
     def __repr__(self):
-        return 'Vertex: {}'.format(self.name) 
+        return 'Vertex: {}'.format(self.name)
 
     def __hash__(self):
-        return hash(repr(self))
+        return self._hash
+
+    def __getstate__(self):
+        return self.name, self.attrs
+
+    def __setstate__(self, state):
+        self.__init__(state[0], **state[1])
 
     def add_attr(self, **kwargs):
-        for k, v in kwargs.items():
-            self.__dict__[k] = v
+        self.attrs.update(kwargs)
+        self._changed()
+
+    def _set_graph(self, graph):
+        object.__setattr__(self, '_graph', graph)
+
+    def _changed(self):
+        if self._graph is not None:
+            self._graph.version += 1
 
 
 class Edge():
+    """A directed edge between two vertices. Attributes other than the
+    endpoints live in `attrs` and are readable and writable as plain
+    attributes.
+
+    An edge belongs to at most one Graph, the first one it is added to;
+    other graphs add a copy of it. Setting, updating or deleting an
+    attribute bumps the version of its graph (changes made to `attrs`
+    directly are not tracked).
+    """
+    __slots__ = ('source', 'target', 'attrs', '_key', '_hash', '_graph')
+
     def __init__(self, source, target, **kwargs):
         if not isinstance(source, Vertex):
             source = Vertex(name=source)
@@ -37,17 +94,31 @@ class Edge():
         if not isinstance(target, Vertex):
             target = Vertex(name=target)
 
-        self.source = source
-        self.target = target
-        for k, v in kwargs.items():
-            self.__dict__[k] = v
+        object.__setattr__(self, 'source', source)
+        object.__setattr__(self, 'target', target)
+        object.__setattr__(self, 'attrs', kwargs)
+        object.__setattr__(self, '_key', (source.name, target.name))
+        object.__setattr__(self, '_hash', hash(self._key))
+        object.__setattr__(self, '_graph', None)  # owner graph
+
+    def __getattr__(self, name):
+        if name in Edge.__slots__:  # slot not set yet, e.g. unpickling
+            raise AttributeError(name)
+        try:
+            return self.attrs[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in Edge.__slots__:
+            raise AttributeError('{} is read-only'.format(name))
+        self.attrs[name] = value
+        self._changed()
 
     def __eq__(self, other):
-        if (self.source == other.source and
-                self.target == other.target):
-            return True
-        else:
-            return False
+        if not isinstance(other, Edge):
+            return NotImplemented
+        return self._key == other._key
 
     def __str__(self):
         return 'Edge: {}->{}'.format(self.source.name, self.target.name)
@@ -56,19 +127,56 @@ class Edge():
         return 'Edge: {}->{}'.format(self.source.name, self.target.name)
 
     def __hash__(self):
-        return hash(repr(self))
+        return self._hash
+
+    def __getstate__(self):
+        return self.source, self.target, self.attrs
+
+    def __setstate__(self, state):
+        self.__init__(state[0], state[1], **state[2])
 
     def update(self, **kwargs):
-        self.__dict__.update(kwargs)
+        self.attrs.update(kwargs)
+        self._changed()
 
     def delete_attr(self, name: str):
-        self.__dict__.pop(name)
+        self.attrs.pop(name)
+        self._changed()
+
+    def copy(self):
+        """Return a copy, endpoints included, that belongs to no graph."""
+        return Edge(Vertex(self.source.name, **self.source.attrs),
+                    Vertex(self.target.name, **self.target.attrs),
+                    **self.attrs)
+
+    def _set_endpoints(self, source: Vertex, target: Vertex):
+        object.__setattr__(self, 'source', source)
+        object.__setattr__(self, 'target', target)
+
+    def _set_graph(self, graph):
+        object.__setattr__(self, '_graph', graph)
+
+    def _changed(self):
+        if self._graph is not None:
+            self._graph.version += 1
 
 
 class Graph():
+    """A directed graph of named vertices.
+
+    `version` is bumped by add_edge and by every attribute change of its
+    edges and vertices (see Edge and Vertex) so that results cached for
+    the graph (see get_shortest_paths and SolveCache) can be invalidated.
+    """
     def __init__(self, edge_list=[]):
         self.edges = set()
         self.vertices = set()
+        self._vertices = {}  # vertex name -> vertex
+        self._out = {}  # source name -> {target name: edge}
+        self._in = {}  # target name -> {source name: edge}
+        self.version = 0
+        self._trees = {}  # cached shortest path trees
+        self._fingerprint = None  # (version, digest), see utils.fingerprint
         if edge_list:
             for edge in edge_list:
                 self.add_edge(edge)
@@ -76,41 +184,234 @@ class Graph():
     def add_edge(self, edge: Edge):
         if edge in self.edges:
             raise ValueError('Cannot add {}. Edge alrady exists.'.format(edge))
+        if edge._graph is not None:  # belongs to another graph
+            edge = edge.copy()
+        # intern the endpoints so that each name maps to one vertex object
+        edge._set_endpoints(self._intern(edge.source),
+                            self._intern(edge.target))
+        edge._set_graph(self)
         self.edges.add(edge)
-        self.vertices.add(edge.source)
-        self.vertices.add(edge.target)
+
+        source_name, target_name = edge.source.name, edge.target.name
+        self._out.setdefault(source_name, {})[target_name] = edge
+        self._in.setdefault(target_name, {})[source_name] = edge
+        self.version += 1
+
+    def _intern(self, vertex: Vertex) -> Vertex:
+        existing = self._vertices.get(vertex.name)
+        if existing is None:
+            if vertex._graph is not None:  # belongs to another graph
+                vertex = Vertex(vertex.name, **vertex.attrs)
+            self._vertices[vertex.name] = vertex
+            self.vertices.add(vertex)
+            vertex._set_graph(self)
+            return vertex
+        if existing is not vertex:
+            for k, v in vertex.attrs.items():
+                existing.attrs.setdefault(k, v)
+        return existing
+
+    def get_vertex(self, name):
+        try:
+            return self._vertices[name]
+        except KeyError:
+            raise KeyError('The requested vertex does not exist!')
 
     def get_edge(self, source_name, target_name):
-        for edge in self.edges:
-            if (edge.source.name == source_name and
-                    edge.target.name == target_name):
-                return edge
-        raise KeyError('The requested edge does not exist!')
+        try:
+            return self._out[source_name][target_name]
+        except KeyError:
+            raise KeyError('The requested edge does not exist!')
 
     def get_edges(self, source_name=None, target_name=None):
-        result = []
-        if not source_name and not target_name:
+        if source_name is None and target_name is None:
             return self.edges
-        if source_name and not target_name:
-            for edge in self.edges:
-                if edge.source.name == source_name:
-                    result.append(edge)
-            return result
-        if target_name and not source_name:
-            for edge in self.edges:
-                if edge.target.name == target_name:
-                    result.append(edge)
-            return result
-        result.append(self.get_edge(source_name, target_name))
-        return result
+        if target_name is None:
+            return list(self._out.get(source_name, {}).values())
+        if source_name is None:
+            return list(self._in.get(target_name, {}).values())
+        return [self.get_edge(source_name, target_name)]
 
     def update_edge(self, source_name, target_name, **kwargs):
-        for edge in self.edges:
-            if (edge.source.name == source_name and
-                    edge.target.name == target_name):
-                edge.update(**kwargs)
-                return
-        raise KeyError('The requested edge does not exist!')
+        self.get_edge(source_name, target_name).update(**kwargs)
+
+    def freeze(self):
+        return CSRGraph(self)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_trees'] = {}  # caches are not shipped
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for item in itertools.chain(self.edges, self._vertices.values()):
+            item._set_graph(self)
+
+
+def _numeric_attrs(objects):
+    """Return the attribute names that hold a real number on every object
+    that has them.
+    """
+    names = dict.fromkeys(k for o in objects for k in o.attrs)
+    return [k for k in names
+            if all(isinstance(o.attrs[k], numbers.Real) and
+                   not isinstance(o.attrs[k], bool)
+                   for o in objects if k in o.attrs)]
+
+
+class CSRGraph():
+    """Immutable compressed sparse row snapshot of a Graph.
+
+    Vertices get integer ids in insertion order, see `names` and `ids`.
+    The out edges of vertex i are the edge ids offsets[i]:offsets[i + 1]
+    with endpoints sources[k] -> targets[k], and in_edges[in_offsets[i]:
+    in_offsets[i + 1]] are the ids of the edges entering vertex i. Every
+    numeric edge (vertex) attribute is held as one float array in
+    edge_attrs (vertex_attrs), NaN where an edge (vertex) lacks it.
+    """
+    def __init__(self, graph: Graph):
+        self.version = graph.version
+        self._trees = {}  # cached shortest path trees
+        self.names = tuple(graph._vertices)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        n = len(self.names)
+
+        edges = [e for out in graph._out.values() for e in out.values()]
+        sources = np.array([self.ids[e.source.name] for e in edges],
+                           dtype=np.int64)
+        targets = np.array([self.ids[e.target.name] for e in edges],
+                           dtype=np.int64)
+        order = np.argsort(sources, kind='stable')
+        edges = [edges[k] for k in order]
+        self.sources = sources[order]
+        self.targets = targets[order]
+
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.sources, minlength=n),
+                  out=self.offsets[1:])
+        self.in_edges = np.argsort(self.targets, kind='stable')
+        self.in_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.targets, minlength=n),
+                  out=self.in_offsets[1:])
+
+        self.edge_attrs = dict(
+            (k, np.array([e.attrs.get(k, np.nan) for e in edges],
+                         dtype=np.float64))
+            for k in _numeric_attrs(edges))
+        vertices = [graph._vertices[name] for name in self.names]
+        self.vertex_attrs = dict(
+            (k, np.array([v.attrs.get(k, np.nan) for v in vertices],
+                         dtype=np.float64))
+            for k in _numeric_attrs(vertices))
+
+        self._lock()
+
+    def _lock(self):
+        for arr in ([self.sources, self.targets, self.offsets,
+                     self.in_edges, self.in_offsets] +
+                    list(self.edge_attrs.values()) +
+                    list(self.vertex_attrs.values())):
+            arr.flags.writeable = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_trees'] = {}  # caches are not shipped
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock()
+
+    @property
+    def n_vertices(self):
+        return len(self.names)
+
+    @property
+    def n_edges(self):
+        return len(self.targets)
+
+    def get_vertex(self, name):
+        """Return a new Vertex carrying the numeric vertex attributes."""
+        i = self.ids[name]
+        return Vertex(name, **dict(
+            (k, float(arr[i])) for k, arr in self.vertex_attrs.items()
+            if not np.isnan(arr[i])))
+
+    def get_edge_id(self, source_name, target_name):
+        i, j = self.ids[source_name], self.ids[target_name]
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        match = np.flatnonzero(self.targets[lo:hi] == j)
+        if not len(match):
+            raise KeyError('The requested edge does not exist!')
+        return int(lo + match[0])
+
+    def to_edge(self, k):
+        """Return a new Edge for edge id k with its numeric attributes."""
+        return Edge(self.names[self.sources[k]], self.names[self.targets[k]],
+                    **dict((attr, float(arr[k]))
+                           for attr, arr in self.edge_attrs.items()
+                           if not np.isnan(arr[k])))
+
+    def get_edge(self, source_name, target_name):
+        return self.to_edge(self.get_edge_id(source_name, target_name))
+
+
+class FlowModel():
+    """Vectorized LP model of a network flow problem on a Graph (or its
+    CSRGraph snapshot).
+
+    The flows are one nonnegative variable `x` over the edges, listed in
+    `edge_names` as (source name, target name). `incidence` is the sparse
+    node-arc incidence matrix (+1 where an edge leaves a vertex, -1 where
+    it enters), and `cost`, `capacity` and `supply` hold the edge costs
+    (0 if missing), edge capacities (np.inf if missing) and vertex net
+    supplies (0 if missing) in the order of `x` and `vertex_names`.
+    """
+    def __init__(self, graph, cost_attr='cost', capacity_attr='capacity_tons',
+                 supply_attr='b', name='x'):
+        csr = graph if isinstance(graph, CSRGraph) else graph.freeze()
+
+        def values(attrs, attr, default, size):
+            if attr not in attrs:
+                return np.full(size, default)
+            return np.where(np.isnan(attrs[attr]), default, attrs[attr])
+
+        n, m = csr.n_vertices, csr.n_edges
+        self.vertex_names = list(csr.names)
+        self.edge_names = [(csr.names[u], csr.names[v])
+                           for u, v in zip(csr.sources, csr.targets)]
+        self.incidence = scipy.sparse.csr_matrix(
+            (np.concatenate([np.ones(m), -np.ones(m)]),
+             (np.concatenate([csr.sources, csr.targets]),
+              np.concatenate([np.arange(m), np.arange(m)]))),
+            shape=(n, m))
+        self.cost = values(csr.edge_attrs, cost_attr, 0., m)
+        self.capacity = values(csr.edge_attrs, capacity_attr, np.inf, m)
+        self.supply = values(csr.vertex_attrs, supply_attr, 0., n)
+        self.x = cp.Variable(m, nonneg=True, name=name)
+
+    def constraints(self) -> list:
+        """Flow conservation (outflow - inflow == supply) and capacities."""
+        constraints = [self.incidence @ self.x == self.supply]
+        capacitated = np.flatnonzero(np.isfinite(self.capacity))
+        if len(capacitated):
+            constraints.append(
+                self.x[capacitated] <= self.capacity[capacitated])
+        return constraints
+
+    def objective(self):
+        return cp.Minimize(self.cost @ self.x)
+
+    def problem(self) -> cp.Problem:
+        """The minimum cost flow problem."""
+        return cp.Problem(self.objective(), self.constraints())
+
+    def to_edges(self, values=None) -> dict:
+        """Map a vector over the edges (default x.value) to edge names."""
+        if values is None:
+            values = self.x.value
+        return dict(zip(self.edge_names, np.asarray(values).tolist()))
 
 
 class NetworkProblem(ABC):
@@ -120,18 +421,367 @@ class NetworkProblem(ABC):
 
 
 class TransportationProblem(NetworkProblem):
-    def solve():
-        pass
+    """Ship `supply` from n sources to `demand` at m destinations at
+    minimum cost, `cost` being the (n, m) unit costs (inf if forbidden).
+
+    Unbalanced problems are balanced with a dummy destination (unused
+    supply) or a dummy source (unmet demand) at zero cost. After solve,
+    `status`, `value`, `flows`, the dual potentials `u` and `v` and the
+    optimal `basis` hold the result. The basis is reused to warm start
+    the next solve, e.g. after the costs change.
+    """
+    def __init__(self, supply, demand, cost):
+        self.supply = np.asarray(supply, dtype=float)
+        self.demand = np.asarray(demand, dtype=float)
+        self.cost = np.asarray(cost, dtype=float)
+        if self.cost.shape != (len(self.supply), len(self.demand)):
+            raise ValueError('The cost must be a (supply, demand) matrix.')
+        self.status = None
+        self.value = None
+        self.flows = None
+        self.u = None
+        self.v = None
+        self.basis = None
+
+    def solve(self) -> dict:
+        from solver.algorithms import transportation_simplex
+
+        result = transportation_simplex(self, basis=self.basis)
+        self.status = result['status']
+        self.value = result['optimal_value']
+        self.flows = result['optimal_solution']
+        self.u = result['u']
+        self.v = result['v']
+        self.basis = result['basis']
+        return result
 
 
 class AssignmentProblem(NetworkProblem):
-    def solve():
-        pass
+    """Assign rows (assignees) to columns (tasks) at minimum total cost.
+
+    `cost` is an (n, m) matrix; infinite entries are forbidden pairs. If
+    n != m, only min(n, m) pairs are assigned. After solve, `status`,
+    `value` and `assignment` (the column of each row, -1 if unassigned)
+    hold the result.
+    """
+    def __init__(self, cost):
+        self.cost = np.asarray(cost, dtype=float)
+        if self.cost.ndim != 2:
+            raise ValueError('The cost must be a matrix.')
+        self.status = None
+        self.value = None
+        self.assignment = None
+
+    def solve(self) -> dict:
+        from solver.algorithms import hungarian_method
+
+        result = hungarian_method(self)
+        self.status = result['status']
+        self.value = result['optimal_value']
+        self.assignment = result['optimal_solution']
+        return result
 
 
 class MaxFlowProblem(NetworkProblem):
-    def solve():
-        pass
+    """Send as much flow as possible from source to target in a Graph (or
+    its CSRGraph snapshot), edge capacities being `capacity_attr`.
+
+    After solve, `status`, `value`, `flows` (per edge), `source_side`
+    and `cut_edges` (a minimum cut) hold the result.
+    """
+    def __init__(self, graph, source_name: str, target_name: str,
+                 capacity_attr='capacity_tons', algorithm='dinic'):
+        self.graph = graph
+        self.source_name = source_name
+        self.target_name = target_name
+        self.capacity_attr = capacity_attr
+        self.algorithm = algorithm
+        self.status = None
+        self.value = None
+        self.flows = None
+        self.source_side = None
+        self.cut_edges = None
+
+    def solve(self) -> dict:
+        from solver.algorithms import get_max_flow
+
+        result = get_max_flow(self.graph, self.source_name,
+                              self.target_name, self.capacity_attr,
+                              self.algorithm)
+        self.status = result['status']
+        self.value = result['optimal_value']
+        self.flows = result['optimal_solution']
+        self.source_side = result['source_side']
+        self.cut_edges = result['cut_edges']
+        return result
+
+
+def _is_integer(var: cp.Variable) -> bool:
+    return var.attributes['boolean'] or var.attributes['integer']
+
+
+class LinearRelaxation():
+    """Parametric LP relaxation of an integer problem.
+
+    The integrality of boolean and integer variables is replaced by
+    `lower <= var <= upper` ([0, 1] for boolean, unbounded for integer
+    variables). The bounds are cp.Parameters of the variable's shape and
+    an infinite bound is switched off through a 0/1 parameter multiplying
+    the variable, because cvxpy's cached parametric program cannot carry
+    infinite values. The problem is canonicalized by cvxpy on the first
+    solve only; later solves just update the bound values (e.g. to fix
+    variables while branching) and reuse the cached canonicalization.
+    Solver options such as warm_start can be passed to solve.
+
+    Solutions are flat vectors: the entries of all variables in order,
+    each variable flattened in row-major order. `integer_index` holds the
+    positions of the entries that must be integral.
+
+    With max_cuts > 0 the relaxation also holds `max_cuts` parametric cut
+    rows `cut_matrix @ x <= cut_rhs` over the flat solution vector x,
+    which are set with set_cuts.
+    """
+    def __init__(self, prob: cp.problems.problem.Problem, max_cuts=0):
+        self.variables = prob.variables()
+        self.integer_vars = [v for v in self.variables if _is_integer(v)]
+
+        self.offsets = {}  # variable id -> first position in solution
+        position = 0
+        for v in self.variables:
+            self.offsets[v.id] = position
+            position += v.size
+        self.size = position
+        self.integer_index = np.array(
+            [i for v in self.integer_vars
+             for i in range(self.offsets[v.id], self.offsets[v.id] + v.size)],
+            dtype=np.int64)
+
+        self.default_lower = np.full(self.size, -np.inf)
+        self.default_upper = np.full(self.size, np.inf)
+        for v in self.integer_vars:
+            if v.attributes['boolean']:
+                self._slice(v, self.default_lower)[:] = 0
+                self._slice(v, self.default_upper)[:] = 1
+
+        # variable id -> (bound, on) parameters
+        self.lower = dict(
+            (v.id, (cp.Parameter(v.shape), cp.Parameter(v.shape)))
+            for v in self.integer_vars)
+        self.upper = dict(
+            (v.id, (cp.Parameter(v.shape), cp.Parameter(v.shape)))
+            for v in self.integer_vars)
+        self.reset_bounds()
+
+        bounds = []
+        for v in self.integer_vars:
+            lower, lower_on = self.lower[v.id]
+            upper, upper_on = self.upper[v.id]
+            bounds += [lower <= cp.multiply(lower_on, v),
+                       cp.multiply(upper_on, v) <= upper]
+
+        self.max_cuts = max_cuts
+        if max_cuts:
+            self.cut_matrix = cp.Parameter(
+                (max_cuts, self.size), value=np.zeros((max_cuts, self.size)))
+            self.cut_rhs = cp.Parameter(max_cuts, value=np.zeros(max_cuts))
+            x = cp.hstack([cp.vec(v, order='C') for v in self.variables])
+            bounds.append(self.cut_matrix @ x <= self.cut_rhs)
+        self.problem = cp.Problem(prob.objective, prob.constraints + bounds)
+        self.constraints = prob.constraints
+        self._closest = None  # distance problem of the feasibility pump
+
+    def _slice(self, var: cp.Variable, vector):
+        start = self.offsets[var.id]
+        return vector[start:start + var.size]
+
+    @staticmethod
+    def _set_bound(parameters, var: cp.Variable, value):
+        value = np.broadcast_to(
+            np.reshape(value, var.shape) if np.size(value) == var.size
+            else value, var.shape).astype(float)
+        finite = np.isfinite(value)
+        parameters[0].value = np.where(finite, value, 0.)
+        parameters[1].value = finite.astype(float)
+
+    def reset_bounds(self):
+        self.set_bound_vectors(self.default_lower, self.default_upper)
+
+    def set_bound_vectors(self, lower, upper):
+        """Set the bounds of all integer entries from flat vectors."""
+        for v in self.integer_vars:
+            self._set_bound(self.lower[v.id], v, self._slice(v, lower))
+            self._set_bound(self.upper[v.id], v, self._slice(v, upper))
+
+    def set_bounds(self, var: cp.Variable, lower=None, upper=None):
+        if lower is not None:
+            self._set_bound(self.lower[var.id], var, lower)
+        if upper is not None:
+            self._set_bound(self.upper[var.id], var, upper)
+
+    def set_cuts(self, matrix, rhs):
+        """Use the rows of `matrix @ x <= rhs` as cuts, at most max_cuts."""
+        n_cuts = len(rhs)
+        if n_cuts > self.max_cuts:
+            raise ValueError('At most {} cuts are supported.'.format(
+                self.max_cuts))
+        cut_matrix = np.zeros((self.max_cuts, self.size))
+        cut_rhs = np.zeros(self.max_cuts)
+        if n_cuts:
+            cut_matrix[:n_cuts] = matrix
+            cut_rhs[:n_cuts] = rhs
+        self.cut_matrix.value = cut_matrix
+        self.cut_rhs.value = cut_rhs
+
+    def _affine_rows(self, expressions) -> list:
+        """(matrix, constant) of each affine expression over the flat
+        solution, with the entries of the expression in column-major order.
+        """
+        # position of each column-major (cvxpy) entry in the flat solution
+        positions = dict(
+            (v.id, self.offsets[v.id] + np.arange(v.size).reshape(
+                v.shape, order='C').ravel(order='F'))
+            for v in self.variables)
+
+        # save_value skips the attribute checks, the saved values may be
+        # fractional LP values of integer variables
+        values = [(v, v.value) for v in self.variables]
+        for v in self.variables:
+            v.save_value(np.zeros(v.shape))
+        rows = []
+        try:
+            for expr in expressions:
+                matrix = np.zeros((expr.size, self.size))
+                for var, jacobian in expr.grad.items():
+                    if jacobian is None or var.id not in positions:
+                        continue
+                    jacobian = jacobian.toarray() if hasattr(
+                        jacobian, 'toarray') else np.atleast_2d(jacobian)
+                    matrix[:, positions[var.id]] = jacobian.reshape(
+                        var.size, expr.size).T
+                rows.append((matrix, np.ravel(
+                    np.asarray(expr.value, dtype=float), order='F')))
+        finally:
+            for v, value in values:
+                v.save_value(value)
+        return rows
+
+    def constraint_rows(self) -> list:
+        """Coefficients of the affine constraints over the flat solution.
+
+        Returns a list of (index, kind, A, b) with the position of the
+        constraint in the original problem, kind 'ub' for the rows
+        A @ x <= b and 'eq' for A @ x == b. Other constraints are skipped.
+        """
+        selected = []
+        for i, c in enumerate(self.constraints):
+            if isinstance(c, cp.constraints.Inequality):
+                kind = 'ub'
+            elif isinstance(c, cp.constraints.Equality):
+                kind = 'eq'
+            else:
+                continue
+            if c.expr.is_affine():  # expr <= 0 or expr == 0
+                selected.append((i, kind, c.expr))
+        rows = self._affine_rows([expr for _, _, expr in selected])
+        return [(i, kind, matrix, -constant)
+                for (i, kind, _), (matrix, constant) in zip(selected, rows)]
+
+    def linear_rows(self) -> tuple:
+        """Coefficients of the affine constraints over the flat solution.
+
+        Returns (A_ub, b_ub, A_eq, b_eq) for the rows A_ub @ x <= b_ub and
+        A_eq @ x == b_eq, as dense arrays. Other constraints are skipped.
+        """
+        rows = self.constraint_rows()
+        result = []
+        for kind in ('ub', 'eq'):
+            matrices = [row[2] for row in rows if row[1] == kind]
+            rhs = [row[3] for row in rows if row[1] == kind]
+            result.append(np.vstack(matrices) if matrices
+                          else np.zeros((0, self.size)))
+            result.append(np.concatenate(rhs) if rhs else np.zeros(0))
+        return tuple(result)
+
+    def objective_coefficients(self) -> tuple:
+        """Return (c, constant) of an affine objective c @ x + constant
+        over the flat solution.
+        """
+        expr = self.problem.objective.expr
+        if not expr.is_affine():
+            raise ValueError('The objective is not affine.')
+        matrix, constant = self._affine_rows([expr])[0]
+        return matrix[0], constant[0]
+
+    def set_solution(self, solution):
+        """Assign a flat solution vector to the variables."""
+        solution = np.asarray(solution, dtype=float)
+        for v in self.variables:
+            v.value = np.reshape(self._slice(v, solution), v.shape)
+
+    def is_feasible(self, solution, tolerance=1e-6) -> bool:
+        """Check a flat solution against the original constraints.
+
+        Integrality is not checked. The variables are left holding the
+        solution.
+        """
+        self.set_solution(solution)
+        return all(c.value(tolerance) for c in self.constraints)
+
+    def solve(self, **kwargs) -> dict:
+        return self._solve(self.problem, **kwargs)
+
+    def solve_closest(self, target, **kwargs) -> dict:
+        """Minimize the L1 distance of the integer entries to the flat
+        vector `target` over the relaxed feasible region within the current
+        bounds, as in the feasibility pump.
+        """
+        if self._closest is None:
+            targets = dict(
+                (v.id, cp.Parameter(v.shape)) for v in self.integer_vars)
+            distances = [cp.Variable(v.shape) for v in self.integer_vars]
+            constraints = list(self.problem.constraints)
+            for v, d in zip(self.integer_vars, distances):
+                constraints += [d >= v - targets[v.id],
+                                d >= targets[v.id] - v]
+            problem = cp.Problem(
+                cp.Minimize(sum(cp.sum(d) for d in distances)), constraints)
+            self._closest = (problem, targets)
+
+        problem, targets = self._closest
+        target = np.asarray(target, dtype=float)
+        for v in self.integer_vars:
+            targets[v.id].value = np.reshape(self._slice(v, target), v.shape)
+        return self._solve(problem, **kwargs)
+
+    def _solve(self, problem, **kwargs) -> dict:
+        result = {'status': None,
+                  'optimal_value': None,
+                  'optimal_solution': None}
+
+        # relax integrality while cvxpy compiles and unpacks the problem
+        attributes = [(v, v.attributes['boolean'], v.attributes['integer'])
+                      for v in self.integer_vars]
+        for var, _, _ in attributes:
+            var.attributes['boolean'] = False
+            var.attributes['integer'] = False
+        try:
+            problem.solve(**kwargs)
+        finally:
+            # reset the integrality of variables
+            for var, boolean, integer in attributes:
+                var.attributes['boolean'] = boolean
+                var.attributes['integer'] = integer
+
+        result.update(
+            {'status': problem.status,
+             'optimal_value': problem.value})
+
+        if problem.status == 'optimal':
+            result.update(
+                {'optimal_solution': np.concatenate(
+                    [np.ravel(v.value) for v in self.variables]).tolist()})
+
+        return result
 
 
 class IntegerProblem(cp.problems.problem.Problem):
@@ -140,6 +790,19 @@ class IntegerProblem(cp.problems.problem.Problem):
         # TODO: check that at least one of the variables is integer
         cp.problems.problem.Problem.__init__(
             self, objective, constraints)
+        self._relaxation = None
+
+    def relaxation(self, max_cuts=0) -> LinearRelaxation:
+        """Return the (cached) parametric LP relaxation of the problem."""
+        if (self._relaxation is None or
+                self._relaxation.max_cuts != max_cuts):
+            self._relaxation = LinearRelaxation(self, max_cuts)
+        return self._relaxation
+
+    def solve_lp_relaxation(self):
+        relaxation = self.relaxation()
+        relaxation.reset_bounds()
+        return relaxation.solve()
 
 
 class MixedIntegerProblem(IntegerProblem):
@@ -161,31 +824,192 @@ class BinaryIntegerProblem(IntegerProblem):
         IntegerProblem.__init__(
             self, objective, constraints)
 
-    def solve_lp_relaxation(self):
-        boolean_vars = []
-        new_constraints = []
-        result = {'status': None,
-                  'optimal_value': None,
-                  'optimal_solution': None}
 
-        for var in self.variables():
-            if var.attributes['boolean']:
-                boolean_vars.append(var)
-                var.attributes['boolean'] = False
-                new_constraints += [0 <= var, var <= 1]
-        lp = cp.Problem(self.objective, self.constraints + new_constraints)
-        lp.solve()
+_missing = object()  # cache miss marker
+
+
+class SolveCache():
+    """LRU cache of solve results keyed by the fingerprint of the inputs
+    (see utils.fingerprint), for problems that are solved again and again.
+
+    call(func, *args, **kwargs) returns the cached result of the call if
+    the same function was called with equal inputs before, e.g.
+    cache.call(get_shortest_path, graph, 'A', 'B') or
+    cache.call(branch_and_bound, prob). solve(prob, **kwargs) solves a
+    cvxpy problem and caches its get_result_summary; on a hit the problem
+    is not solved, so its variables keep their values.
+
+    At most max_size results are kept in memory, the least recently used
+    being evicted first. With a directory `path` the results are also
+    pickled there, at most `disk_size` of them (max_size by default), and
+    found again by later caches using the same directory. Results are
+    copies, changing them does not change the cache.
+    """
+    def __init__(self, max_size=128, path=None, disk_size=None):
+        if max_size < 1:
+            raise ValueError('The cache must hold at least one result.')
+        self.max_size = max_size
+        self.path = path
+        self.disk_size = max_size if disk_size is None else disk_size
+        self._entries = collections.OrderedDict()  # key -> pickled result
+        self.hits = 0
+        self.misses = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries or (
+            self.path is not None and os.path.exists(self._file(key)))
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.pkl')
+
+    @staticmethod
+    def key(func, *args, **kwargs) -> str:
+        from solver.utils import fingerprint
+
+        return fingerprint([func.__module__, func.__qualname__, list(args),
+                            kwargs])
+
+    def get(self, key, default=None):
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+        elif self.path is not None:
+            try:
+                with open(self._file(key), 'rb') as f:
+                    data = f.read()
+                os.utime(self._file(key))  # recently used
+            except OSError:
+                pass
+            if data is not None:
+                self._remember(key, data)
+        if data is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return pickle.loads(data)
+
+    def put(self, key, result):
+        data = pickle.dumps(result)
+        self._remember(key, data)
+        if self.path is not None:
+            # write then rename so readers never see a partial file
+            fd, name = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(name, self._file(key))
+            self._evict_files()
+
+    def _remember(self, key, data):
+        self._entries[key] = data
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _evict_files(self):
+        files = [os.path.join(self.path, name)
+                 for name in os.listdir(self.path) if name.endswith('.pkl')]
+        if len(files) <= self.disk_size:
+            return
+        files.sort(key=os.path.getmtime)
+        for name in files[:len(files) - self.disk_size]:
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+
+    def clear(self):
+        """Empty the cache, including its directory."""
+        self._entries.clear()
+        if self.path is not None:
+            for name in os.listdir(self.path):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.path, name))
+
+    def call(self, func, *args, **kwargs):
+        key = self.key(func, *args, **kwargs)
+        result = self.get(key, _missing)
+        if result is _missing:
+            result = func(*args, **kwargs)
+            self.put(key, result)
+        return result
 
-        result.update(
-            {'status': lp.status,
-             'optimal_value': lp.value})
+    def solve(self, prob: cp.problems.problem.Problem, **kwargs) -> dict:
+        from solver.utils import get_result_summary
 
-        if lp.status == 'optimal':
-            result.update(
-                {'optimal_solution': [v.value[0]for v in lp.variables()]})
+        key = self.key(cp.problems.problem.Problem.solve, prob, **kwargs)
+        result = self.get(key, _missing)
+        if result is _missing:
+            prob.solve(**kwargs)
+            result = get_result_summary(prob)
+            self.put(key, result)
+        return result
 
-        # reset the boolean state of variables
-        for var in boolean_vars:
-            var.attributes['boolean'] = True
 
+class SolverStats():
+    """Measurements filled in by the algorithms that take a `stats`
+    argument (branch_and_bound, get_shortest_path and
+    get_minimum_spanning_tree). One object may be passed to several
+    calls, the numbers then add up.
+
+    `counters` counts events by name:
+        branch and bound: 'nodes_explored' (node LPs solved),
+            'nodes_pruned' (fathomed by bound), 'nodes_infeasible',
+            'nodes_integral', 'nodes_branched' and 'incumbents'
+        graph algorithms: 'heap_pushes', 'heap_pops' (queue operations
+            for Bellman-Ford), 'edges_relaxed' (edges scanned from a
+            settled vertex), 'vertices_settled' and, for Kruskal,
+            'union_finds'
+    `times` accumulates seconds by phase, 'total' and for branch and
+    bound 'lp', 'cuts' and 'heuristics'; `overhead_time` is the rest.
+    `max_depth` is the deepest node solved and `trace` holds a
+    (seconds, incumbent, bound) row whenever the incumbent or the dual
+    bound of branch and bound changes, in the problem's sense.
+
+    callback(event, stats) is called on 'incumbent' and 'bound' changes
+    and on 'finish' of every call, e.g. to export as_dict() to metrics.
+    """
+    def __init__(self, callback=None):
+        self.counters = collections.Counter()
+        self.times = collections.defaultdict(float)
+        self.max_depth = 0
+        self.trace = []
+        self.callback = callback
+        self._start = time.perf_counter()
+
+    def elapsed(self) -> float:
+        """Seconds since the stats were created."""
+        return time.perf_counter() - self._start
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def add_time(self, name, seconds):
+        self.times[name] += seconds
+
+    @property
+    def overhead_time(self) -> float:
+        return self.times['total'] - sum(
+            t for name, t in self.times.items() if name != 'total')
+
+    def record(self, event, incumbent, bound):
+        """Append a trace row and notify the callback of the event."""
+        self.trace.append((self.elapsed(), float(incumbent), float(bound)))
+        self.notify(event)
+
+    def notify(self, event):
+        if self.callback is not None:
+            self.callback(event, self)
+
+    def as_dict(self) -> dict:
+        """Flat dict of the counters, times (suffixed _time) and depth."""
+        result = dict(self.counters)
+        result.update(('{}_time'.format(name), t)
+                      for name, t in self.times.items())
+        result['overhead_time'] = self.overhead_time
+        result['max_depth'] = self.max_depth
         return result
@@ -1,12 +1,28 @@
 import cvxpy as cp
+import numpy as np
 
+import itertools
 import logging
+import pickle
+import tempfile
+import time
 import unittest
 
+from applications.unit_commitment import UnitCommitmentProblem
 from solver.algorithms import branch_and_bound, get_shortest_path
+from solver.algorithms import ShortestPathTree, get_shortest_paths
 from solver.algorithms import _extract_path, get_minimum_spanning_tree
+from solver.algorithms import hungarian_method, hungarian_method_batch
+from solver.algorithms import get_max_flow, get_min_cost_flow
+from solver.algorithms import parameter_sweep, transportation_simplex
+from solver.classes import AssignmentProblem, FlowModel, MaxFlowProblem
+from solver.classes import TransportationProblem
 from solver.classes import BinaryIntegerProblem, Edge, Graph, Vertex
+from solver.classes import MixedIntegerProblem
+from solver.classes import SolveCache, SolverStats
 from solver.utils import is_integer_solution, get_variable
+from solver.utils import fingerprint, get_sensitivity_report
+from solver.utils import parameter_grid
 
 
 class TestBinaryIntegerProblem(unittest.TestCase):
@@ -40,6 +56,28 @@ class TestBinaryIntegerProblem(unittest.TestCase):
         self.assertTrue(x3.attributes['boolean'])
         self.assertTrue(x4.attributes['boolean'])
 
+    def test_parametric_relaxation(self):
+        x1 = cp.Variable(1, boolean=True, name='x1')
+        x2 = cp.Variable(1, boolean=True, name='x2')
+
+        obj = cp.Maximize(3 * x1 + 2 * x2)
+        bip = BinaryIntegerProblem(obj, [2 * x1 + 2 * x2 <= 3])
+        relaxation = bip.relaxation()
+        self.assertIs(bip.relaxation(), relaxation)
+
+        self.assertAlmostEqual(relaxation.solve()['optimal_value'], 4, 5)
+
+        relaxation.set_bounds(x1, upper=0)
+        result = relaxation.solve()
+        self.assertAlmostEqual(result['optimal_value'], 2, 5)
+        self.assertAlmostEqual(result['optimal_solution'][0], 0, 5)
+        # the canonicalization is reused across bound changes
+        self.assertIsNotNone(relaxation.problem._cache.param_prog)
+        self.assertTrue(x1.attributes['boolean'])
+
+        self.assertAlmostEqual(
+            bip.solve_lp_relaxation()['optimal_value'], 4, 5)
+
     def test_boolean_false_raises_exception(self):
         # Original BIP (book section 11.6)
         x1 = cp.Variable(1, boolean=False, name='x1')
@@ -76,6 +114,210 @@ class TestBranchAndBound(unittest.TestCase):
         self.assertEqual(result.get('optimal_solution')[2], 0)
         self.assertEqual(result.get('optimal_solution')[3], 0)
 
+    def test_node_selection_and_branching(self):
+        # knapsack, optimum 0 1 1 1 1 with value 25
+        x = [cp.Variable(1, boolean=True, name='x{}'.format(i))
+             for i in range(5)]
+        values = [12, 7, 6, 5, 7]
+        weights = [9, 4, 3, 3, 5]
+        obj = cp.Maximize(sum(v * xi for v, xi in zip(values, x)))
+        constraints = [sum(w * xi for w, xi in zip(weights, x)) <= 15]
+        bip = BinaryIntegerProblem(obj, constraints)
+
+        for node_selection in ['depth_first', 'best_bound', 'best_estimate']:
+            for branching in ['most_fractional', 'pseudo_cost']:
+                result = branch_and_bound(
+                    bip, node_selection=node_selection, branching=branching)
+                self.assertEqual(result.get('status'), 'optimal')
+                self.assertAlmostEqual(result.get('optimal_value'), 25)
+                self.assertEqual(result.get('optimal_solution'),
+                                 [0, 1, 1, 1, 1])
+
+        with self.assertRaises(ValueError):
+            branch_and_bound(bip, node_selection='breadth_first')
+
+        serial = branch_and_bound(bip)
+        for _ in range(2):
+            self.assertEqual(branch_and_bound(bip, workers=2), serial)
+
+    def test_limits_and_gap(self):
+        x = [cp.Variable(1, boolean=True, name='x{}'.format(i))
+             for i in range(5)]
+        values = [12, 7, 6, 5, 7]
+        weights = [9, 4, 3, 3, 5]
+        obj = cp.Maximize(sum(v * xi for v, xi in zip(values, x)))
+        constraints = [sum(w * xi for w, xi in zip(weights, x)) <= 15]
+        bip = BinaryIntegerProblem(obj, constraints)
+
+        result = branch_and_bound(bip)
+        self.assertEqual(result.get('termination'), 'completed')
+        self.assertAlmostEqual(result.get('dual_bound'), 25)
+        self.assertAlmostEqual(result.get('gap'), 0)
+
+        result = branch_and_bound(bip, time_limit=0)
+        self.assertEqual(result.get('termination'), 'time_limit')
+
+        # Original BIP (book section 11.6)
+        x1, x2, x3, x4 = x[:4]
+        obj = cp.Maximize(9 * x1 + 5 * x2 + 6 * x3 + 4 * x4)
+        constraints = [6 * x1 + 3 * x2 + 5 * x3 + 2 * x4 <= 10,
+                       x3 + x4 <= 1,
+                       -x1 + x3 <= 0,
+                       -x2 + x4 <= 0]
+        bip = BinaryIntegerProblem(obj, constraints)
+
+        result = branch_and_bound(bip, node_limit=1, heuristics=(),
+                                  cuts=())
+        self.assertEqual(result.get('status'), 'user_limit')
+        self.assertEqual(result.get('termination'), 'node_limit')
+        self.assertIsNone(result.get('optimal_solution'))
+        self.assertAlmostEqual(result.get('dual_bound'), 16.5, 5)
+        self.assertEqual(result.get('gap'), np.inf)
+
+        result = branch_and_bound(bip, node_selection='depth_first',
+                                  rel_gap=0.1)
+        self.assertEqual(result.get('status'), 'optimal')
+        self.assertIn(result.get('termination'), ['gap', 'completed'])
+        self.assertLessEqual(result.get('gap'), 0.1)
+        self.assertLessEqual(result.get('optimal_value'),
+                             result.get('dual_bound') + 1e-6)
+
+    def test_primal_heuristics(self):
+        # Original BIP (book section 11.6)
+        x1 = cp.Variable(1, boolean=True, name='x1')
+        x2 = cp.Variable(1, boolean=True, name='x2')
+        x3 = cp.Variable(1, boolean=True, name='x3')
+        x4 = cp.Variable(1, boolean=True, name='x4')
+
+        obj = cp.Maximize(9 * x1 + 5 * x2 + 6 * x3 + 4 * x4)
+        constraints = [6 * x1 + 3 * x2 + 5 * x3 + 2 * x4 <= 10,
+                       x3 + x4 <= 1,
+                       -x1 + x3 <= 0,
+                       -x2 + x4 <= 0]
+        bip = BinaryIntegerProblem(obj, constraints)
+
+        # the root LP rounds to an infeasible point, so only diving and
+        # the feasibility pump can seed the incumbent
+        result = branch_and_bound(bip, node_limit=1, heuristics=('rounding',),
+                                  cuts=())
+        self.assertIsNone(result.get('optimal_solution'))
+
+        for heuristic in ['diving', 'feasibility_pump']:
+            result = branch_and_bound(
+                bip, node_limit=1, heuristics=(heuristic,), cuts=())
+            self.assertEqual(result.get('status'), 'user_limit')
+            self.assertIsNotNone(result.get('optimal_solution'))
+            self.assertLessEqual(result.get('optimal_value'), 14)
+
+        result = branch_and_bound(bip, heuristic_frequency=1)
+        self.assertAlmostEqual(result.get('optimal_value'), 14)
+        self.assertEqual(result.get('optimal_solution'), [1, 1, 0, 0])
+
+        with self.assertRaises(ValueError):
+            branch_and_bound(bip, heuristics=('local_branching',))
+
+    def test_time_limit_large_instance(self):
+        # multidimensional knapsack, far too large to complete
+        rng = np.random.default_rng(0)
+        weights = rng.integers(1, 100, (5, 2000))
+        x = cp.Variable(2000, boolean=True, name='x')
+        obj = cp.Maximize(rng.integers(1, 100, 2000) @ x)
+        constraints = [weights @ x <= weights.sum(axis=1) / 3]
+        bip = BinaryIntegerProblem(obj, constraints)
+
+        for time_limit in [0.5, 1]:
+            start_time = time.perf_counter()
+            result = branch_and_bound(bip, time_limit=time_limit)
+            self.assertLess(time.perf_counter() - start_time, time_limit + 1)
+            self.assertEqual(result.get('termination'), 'time_limit')
+
+        # the dive fixes batches of entries, a few LPs reach an incumbent
+        start_time = time.perf_counter()
+        result = branch_and_bound(bip, node_limit=1, heuristics=('diving',),
+                                  cuts=())
+        self.assertLess(time.perf_counter() - start_time, 5)
+        self.assertEqual(result.get('termination'), 'node_limit')
+        self.assertIsNotNone(result.get('optimal_solution'))
+        self.assertLessEqual(result.get('optimal_value'),
+                             result.get('dual_bound'))
+
+    def test_cutting_planes(self):
+        # Original BIP (book section 11.6), root LP bound 16.5
+        x1 = cp.Variable(1, boolean=True, name='x1')
+        x2 = cp.Variable(1, boolean=True, name='x2')
+        x3 = cp.Variable(1, boolean=True, name='x3')
+        x4 = cp.Variable(1, boolean=True, name='x4')
+
+        obj = cp.Maximize(9 * x1 + 5 * x2 + 6 * x3 + 4 * x4)
+        constraints = [6 * x1 + 3 * x2 + 5 * x3 + 2 * x4 <= 10,
+                       x3 + x4 <= 1,
+                       -x1 + x3 <= 0,
+                       -x2 + x4 <= 0]
+        bip = BinaryIntegerProblem(obj, constraints)
+
+        for cuts in [('cover',), ('gomory',)]:
+            result = branch_and_bound(bip, node_limit=1, heuristics=(),
+                                      cuts=cuts)
+            self.assertLess(result.get('dual_bound'), 16.5 - 1e-3)
+            self.assertGreaterEqual(result.get('dual_bound'), 14 - 1e-6)
+
+        result = branch_and_bound(bip, cut_frequency=1)
+        self.assertAlmostEqual(result.get('optimal_value'), 14)
+        self.assertEqual(result.get('optimal_solution'), [1, 1, 0, 0])
+
+        # odd cycle of conflicts, root LP bound 1.5
+        x = cp.Variable(3, boolean=True, name='x')
+        constraints = [x[0] + x[1] <= 1, x[1] + x[2] <= 1, x[0] + x[2] <= 1]
+        bip = BinaryIntegerProblem(cp.Maximize(cp.sum(x)), constraints)
+        result = branch_and_bound(bip, node_limit=1, heuristics=(),
+                                  cuts=('clique',))
+        self.assertAlmostEqual(result.get('dual_bound'), 1, 5)
+
+        with self.assertRaises(ValueError):
+            branch_and_bound(bip, cuts=('lift_and_project',))
+
+    def test_vector_and_mixed_integer(self):
+        x = cp.Variable(5, boolean=True, name='x')
+        obj = cp.Maximize(np.array([12, 7, 6, 5, 7]) @ x)
+        constraints = [np.array([9, 4, 3, 3, 5]) @ x <= 15]
+        result = branch_and_bound(BinaryIntegerProblem(obj, constraints))
+        self.assertAlmostEqual(result.get('optimal_value'), 25)
+        self.assertEqual(result.get('optimal_solution'), [0, 1, 1, 1, 1])
+
+        y = cp.Variable(2, integer=True, name='y')
+        w = cp.Variable(name='w')
+        obj = cp.Maximize(5 * y[0] + 4 * y[1] + w)
+        constraints = [6 * y[0] + 4 * y[1] <= 24,
+                       y[0] + 2 * y[1] <= 6,
+                       y >= 0,
+                       w <= 0.5]
+        mip = MixedIntegerProblem(obj, constraints)
+        self.assertAlmostEqual(
+            mip.solve_lp_relaxation().get('optimal_value'), 21.5, 5)
+
+        result = branch_and_bound(mip)
+        self.assertAlmostEqual(result.get('optimal_value'), 20.5, 5)
+        self.assertEqual(list(y.value), [4, 0])
+        self.assertAlmostEqual(w.value, 0.5, 5)
+        self.assertTrue(y.attributes['integer'])
+
+    def test_minimize_and_infeasible(self):
+        x1 = cp.Variable(1, boolean=True, name='x1')
+        x2 = cp.Variable(1, boolean=True, name='x2')
+        x3 = cp.Variable(1, boolean=True, name='x3')
+
+        obj = cp.Minimize(3 * x1 + 2 * x2 + 4 * x3)
+        bip = BinaryIntegerProblem(obj, [2 * x1 + 2 * x2 + 2 * x3 >= 3])
+        result = branch_and_bound(bip)
+        self.assertAlmostEqual(result.get('optimal_value'), 5)
+        self.assertEqual(result.get('optimal_solution'), [1, 1, 0])
+
+        bip = BinaryIntegerProblem(obj, [x1 + x2 + x3 >= 1.5,
+                                         x1 + x2 + x3 <= 1.8])
+        result = branch_and_bound(bip)
+        self.assertEqual(result.get('status'), 'infeasible')
+        self.assertEqual(result.get('optimal_value'), np.inf)
+
 
 class TestVertex(unittest.TestCase):
 
@@ -87,6 +329,22 @@ class TestVertex(unittest.TestCase):
         v.add_attr(delta='dawn')
         self.assertEqual(v.delta, 'dawn')
 
+        v.attr1 = 3
+        self.assertEqual(v.attrs, {'attr1': 3, 'attr2': 2, 'delta': 'dawn'})
+        with self.assertRaises(AttributeError):
+            v.attr3
+        with self.assertRaises(AttributeError):
+            v.name = 'b'
+
+    def test_hash_and_pickle(self):
+        v = Vertex('a', x=1)
+        self.assertEqual(hash(v), hash('a'))
+        self.assertEqual(v, Vertex('a'))
+
+        w = pickle.loads(pickle.dumps(v))
+        self.assertEqual(w, v)
+        self.assertEqual(w.x, 1)
+
 
 class TestEdge(unittest.TestCase):
 
@@ -117,7 +375,7 @@ class TestEdge(unittest.TestCase):
     def test_delete(self):
         e1 = Edge(1, 2, cost=1)
         e1.delete_attr('cost')
-        self.assertFalse('cost' in e1.__dict__)
+        self.assertFalse('cost' in e1.attrs)
 
 
 class TestGraph(unittest.TestCase):
@@ -162,6 +420,41 @@ class TestGraph(unittest.TestCase):
         graph.update_edge(0, 1, alpha='boom')
         self.assertEqual(graph.get_edge(0, 1).alpha, 'boom')
 
+    def test_vertices_are_interned(self):
+        graph = Graph([Edge(0, 1), Edge(1, 2), Edge(Vertex(2, x=1), 0)])
+
+        self.assertEqual(len(graph.vertices), 3)
+        self.assertIs(graph.get_edge(0, 1).target,
+                      graph.get_edge(1, 2).source)
+        self.assertIs(graph.get_edge(1, 2).target,
+                      graph.get_edge(2, 0).source)
+        self.assertEqual(graph.get_vertex(2).x, 1)
+
+        copy = pickle.loads(pickle.dumps(graph))
+        self.assertIs(copy.get_edge(0, 1).target,
+                      copy.get_edge(1, 2).source)
+
+    def test_edges_belong_to_one_graph(self):
+        edge = Edge(0, 1, cost=4)
+        graph = Graph([edge, Edge(Vertex(1, x=1), 2)])
+        # the other graph adds copies and leaves graph untouched
+        other = Graph([edge, Edge(graph.get_vertex(1), 3),
+                       Edge(Vertex(0, x=2), 3)])
+        self.assertIs(graph.get_edge(0, 1), edge)
+        self.assertIs(edge.target, graph.get_vertex(1))
+        self.assertIsNot(other.get_edge(0, 1), edge)
+        self.assertIsNot(other.get_vertex(1), graph.get_vertex(1))
+        self.assertIs(other.get_edge(0, 1).target, other.get_vertex(1))
+        self.assertEqual(other.get_edge(0, 1).cost, 4)
+        self.assertEqual(other.get_vertex(1).x, 1)
+        self.assertEqual(other.get_vertex(0).x, 2)
+        self.assertNotIn('x', graph.get_vertex(0).attrs)
+
+        other.get_edge(0, 1).cost = 5
+        other.get_vertex(1).x = 2
+        self.assertEqual(edge.cost, 4)
+        self.assertEqual(graph.get_vertex(1).x, 1)
+
     def test_get_edges(self):
         e1 = Edge(0, 1, cost=4)
         e2 = Edge(0, 2, cost=5)
@@ -175,6 +468,60 @@ class TestGraph(unittest.TestCase):
         result = graph.get_edges(target_name=1)
         self.assertEqual(result[0], e1)
 
+    def test_adjacency_index(self):
+        e1 = Edge(0, 1, cost=4)
+        e2 = Edge(0, 2, cost=5)
+        e3 = Edge(2, 1, cost=6)
+        graph = Graph([e1, e2, e3])
+
+        self.assertEqual(set(graph.get_edges(source_name=0)), {e1, e2})
+        self.assertEqual(set(graph.get_edges(target_name=1)), {e1, e3})
+        self.assertEqual(graph.get_edges(source_name=1), [])
+        self.assertEqual(graph.get_edges(0, 2), [e2])
+
+        with self.assertRaises(KeyError):
+            graph.get_edge(1, 0)
+        with self.assertRaises(KeyError):
+            graph.update_edge(1, 0, cost=1)
+
+
+class TestCSRGraph(unittest.TestCase):
+
+    def test_freeze(self):
+        graph = Graph([
+            Edge('a', 'b', cost=1, length=2.5, label='x'),
+            Edge('b', 'c', cost=2, length=1.0, label='y'),
+            Edge('a', 'c', cost=4, length=3.0, label='z'),
+        ])
+        graph.get_vertex('a').add_attr(lat=1.0)
+        csr = graph.freeze()
+
+        self.assertEqual(csr.n_vertices, 3)
+        self.assertEqual(csr.n_edges, 3)
+        self.assertEqual(csr.names[csr.ids['c']], 'c')
+        self.assertEqual(set(csr.edge_attrs), {'cost', 'length'})
+        self.assertEqual(set(csr.vertex_attrs), {'lat'})
+        self.assertTrue(np.isnan(csr.vertex_attrs['lat'][csr.ids['b']]))
+        self.assertEqual(csr.get_vertex('a').lat, 1.0)
+        self.assertNotIn('lat', csr.get_vertex('b').attrs)
+        self.assertEqual(list(csr.offsets), [0, 2, 3, 3])
+        self.assertEqual(list(csr.in_offsets), [0, 0, 1, 3])
+
+        self.assertEqual(csr.get_edge('b', 'c').length, 1.0)
+        self.assertEqual(csr.get_edge('a', 'c').cost, 4)
+        with self.assertRaises(KeyError):
+            csr.get_edge('c', 'a')
+        with self.assertRaises(ValueError):
+            csr.edge_attrs['cost'][0] = 10
+
+        self.assertEqual(get_shortest_path(csr, 'a', target_name='c'),
+                         (3, ['a', 'b', 'c']))
+        self.assertEqual(get_shortest_path(csr, 'a', target_name=None),
+                         ({'a': 0, 'b': 1, 'c': 3},
+                          {'a': None, 'b': 'a', 'c': 'b'}))
+        tree = get_minimum_spanning_tree(csr, algorithm='kruskal')
+        self.assertEqual(sum(e.length for e in tree.edges), 3.5)
+
 
 class TestDijkstra(unittest.TestCase):
 
@@ -271,6 +618,178 @@ class TestDijkstra(unittest.TestCase):
         self.assertEqual(result[1]['E'], 'B')
         self.assertEqual(result[1]['T'], 'D')
 
+    def test_get_shortest_path_ties_and_early_stop(self):
+        edge_list = [
+            Edge(0, 1, cost=1),
+            Edge(0, 2, cost=1),
+            Edge(1, 3, cost=1),
+            Edge(2, 3, cost=1),
+            Edge(3, 4, cost=10),
+        ]
+        graph = Graph(edge_list)
+
+        for _ in range(3):  # deterministic on ties
+            self.assertEqual(
+                get_shortest_path(graph, 0, target_name=3), (2, [0, 1, 3]))
+
+        dists, previous_nodes = get_shortest_path(graph, 0, target_name=None)
+        self.assertEqual(dists, {0: 0, 1: 1, 2: 1, 3: 2, 4: 12})
+        self.assertEqual(previous_nodes[3], 1)
+
+        # vertex 4 is never settled when searching for 1
+        self.assertEqual(get_shortest_path(graph, 0, target_name=1),
+                         (1, [0, 1]))
+        with self.assertRaises(KeyError):
+            get_shortest_path(graph, 4, target_name=0)
+
+    def test_get_shortest_path_algorithms(self):
+        # grid with coordinates, unit costs along rows and columns
+        edge_list = []
+        for i in range(4):
+            for j in range(4):
+                if i < 3:
+                    edge_list.append(Edge((i, j), (i + 1, j), cost=1))
+                    edge_list.append(Edge((i + 1, j), (i, j), cost=1))
+                if j < 3:
+                    edge_list.append(Edge((i, j), (i, j + 1), cost=1))
+                    edge_list.append(Edge((i, j + 1), (i, j), cost=1))
+        graph = Graph(edge_list)
+        for v in graph.vertices:
+            v.add_attr(x=v.name[0], y=v.name[1])
+
+        def manhattan(u, v):
+            return abs(u.x - v.x) + abs(u.y - v.y)
+
+        for algorithm in ['dijkstra', 'bidirectional', 'astar',
+                          'bellman_ford']:
+            dist, path = get_shortest_path(
+                graph, (0, 0), target_name=(3, 2), algorithm=algorithm,
+                heuristic=manhattan)
+            self.assertEqual(dist, 5)
+            self.assertEqual(len(path), 6)
+            self.assertEqual(path[0], (0, 0))
+            self.assertEqual(path[-1], (3, 2))
+
+        self.assertEqual(
+            get_shortest_path(graph, (1, 1), target_name=(1, 1),
+                              algorithm='bidirectional'), (0, [(1, 1)]))
+
+        with self.assertRaises(ValueError):
+            get_shortest_path(graph, (0, 0), target_name=None,
+                              algorithm='bidirectional')
+        with self.assertRaises(ValueError):
+            get_shortest_path(graph, (0, 0), target_name=(3, 3),
+                              algorithm='astar')
+        with self.assertRaises(ValueError):
+            get_shortest_path(graph, (0, 0), algorithm='floyd')
+
+    def test_bellman_ford(self):
+        graph = Graph([
+            Edge('s', 'a', cost=4),
+            Edge('s', 'b', cost=2),
+            Edge('a', 't', cost=1),
+            Edge('b', 'a', cost=-3),
+        ])
+        dists, previous_nodes = get_shortest_path(
+            graph, 's', target_name=None, algorithm='bellman_ford')
+        self.assertEqual(dists, {'s': 0, 'a': -1, 'b': 2, 't': 0})
+        self.assertEqual(
+            get_shortest_path(graph, 's', target_name='t',
+                              algorithm='bellman_ford'),
+            (0, ['s', 'b', 'a', 't']))
+
+        graph.add_edge(Edge('a', 'b', cost=1))  # negative cycle a->b->a
+        with self.assertRaises(ValueError):
+            get_shortest_path(graph, 's', algorithm='bellman_ford')
+
+    def test_shortest_path_tree(self):
+        graph = Graph([
+            Edge('s', 'a', cost=1),
+            Edge('a', 'b', cost=1),
+            Edge('b', 'c', cost=1),
+            Edge('s', 'c', cost=5),
+            Edge('a', 'c', cost=3),
+        ])
+        tree = ShortestPathTree(graph, 's')
+        self.assertEqual(tree.get_path('c'), (3, ['s', 'a', 'b', 'c']))
+
+        # increase on a tree edge relabels the subtree of b
+        tree.update_edge('a', 'b', cost=4)
+        self.assertEqual(tree.dists, {'s': 0, 'a': 1, 'b': 5, 'c': 4})
+        self.assertEqual(tree.get_path('c'), (4, ['s', 'a', 'c']))
+
+        # decrease propagates from the edge's target
+        tree.update_edge('s', 'c', cost=2)
+        self.assertEqual(tree.get_path('c'), (2, ['s', 'c']))
+        self.assertEqual(tree.get_path('b'), (5, ['s', 'a', 'b']))
+
+        tree.add_edge(Edge('c', 'b', cost=1))
+        tree.add_edge(Edge('b', 'd', cost=1))
+        self.assertEqual(tree.get_path('d'), (4, ['s', 'c', 'b', 'd']))
+        self.assertEqual(tree.get_path('e'), (np.inf, None))
+
+        # changes made directly on the graph trigger a recompute
+        graph.update_edge('s', 'c', cost=10)
+        self.assertEqual(tree.get_path('c'), (4, ['s', 'a', 'c']))
+        self.assertEqual(tree.dists, get_shortest_path(
+            graph, 's', target_name=None)[0])
+
+    def test_get_shortest_paths(self):
+        graph = Graph([
+            Edge('s1', 'a', cost=1),
+            Edge('s1', 'b', cost=4),
+            Edge('s2', 'b', cost=1),
+            Edge('a', 'b', cost=1),
+            Edge('a', 't1', cost=5),
+            Edge('b', 't1', cost=1),
+            Edge('b', 't2', cost=3),
+            Edge('t3', 'b', cost=1),
+        ])
+        sources, targets = ['s1', 's2'], ['t1', 't2', 't3']
+        for g in [graph, graph.freeze()]:
+            distances, paths = get_shortest_paths(g, sources, targets)
+            np.testing.assert_array_equal(
+                distances, [[3, 5, np.inf], [2, 4, np.inf]])
+            self.assertEqual(paths[('s1', 't1')], ['s1', 'a', 'b', 't1'])
+            self.assertEqual(paths[('s2', 't2')], ['s2', 'b', 't2'])
+            self.assertIsNone(paths[('s1', 't3')])
+            for source in sources:
+                for target in targets[:2]:
+                    self.assertEqual(
+                        get_shortest_path(g, source, target_name=target),
+                        (distances[sources.index(source),
+                                   targets.index(target)],
+                         paths[(source, target)]))
+
+        # trees are cached until the graph changes
+        self.assertEqual(len(graph._trees), 2)
+        tree = graph._trees[('s1', 'dijkstra')]
+        get_shortest_paths(graph, ['s1'], ['t1'])
+        self.assertIs(graph._trees[('s1', 'dijkstra')], tree)
+
+        graph.update_edge('a', 'b', cost=5)
+        distances, paths = get_shortest_paths(graph, sources, targets)
+        self.assertEqual(distances[0, 0], 5)
+        self.assertEqual(paths[('s1', 't1')], ['s1', 'b', 't1'])
+        graph.add_edge(Edge('s1', 't3', cost=1))
+        distances, _ = get_shortest_paths(graph, sources, targets)
+        self.assertEqual(distances[0, 2], 1)
+        graph.get_edge('s2', 'b').cost = 2  # in place, also tracked
+        distances, _ = get_shortest_paths(graph, sources, targets)
+        self.assertEqual(distances[1, 0], 3)
+
+        parallel = get_shortest_paths(graph.freeze(), sources, targets,
+                                      workers=2)
+        np.testing.assert_array_equal(parallel[0], distances)
+
+        # the default targets are all vertices in insertion order
+        names = ['s1', 'a', 'b', 's2', 't1', 't2', 't3']
+        for g in [graph, graph.freeze()]:
+            distances, paths = get_shortest_paths(g, ['s1'])
+            np.testing.assert_array_equal(
+                distances, [[0, 1, 2, np.inf, 3, 5, 1]])
+            self.assertEqual([t for _, t in paths], names)
+
 
 class TestUtils(unittest.TestCase):
 
@@ -291,6 +810,53 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(v1.name(), 'x1')
         self.assertEqual(v1.id, x1.id)
 
+    def test_sensitivity_report(self):
+        x = cp.Variable(2, nonneg=True)
+        constraints = [x[0] <= 4, 2 * x[1] <= 12, 3 * x[0] + 2 * x[1] <= 18]
+        prob = cp.Problem(cp.Maximize(3 * x[0] + 5 * x[1]), constraints)
+        with self.assertRaises(ValueError):
+            get_sensitivity_report(prob)
+
+        prob.solve()
+        report = get_sensitivity_report(prob)
+        np.testing.assert_allclose(report.get('dual'), [0, 1.5, 1],
+                                   atol=1e-6)
+        np.testing.assert_array_equal(report.get('binding'),
+                                      [False, True, True])
+        np.testing.assert_allclose(report.get('slack'), [2, 0, 0],
+                                   atol=1e-6)
+        np.testing.assert_allclose(report.get('objective_range'),
+                                   [[0, 7.5], [2, np.inf]], atol=1e-6)
+        np.testing.assert_allclose(report.get('rhs_range'),
+                                   [[2, np.inf], [6, 18], [12, 24]],
+                                   atol=1e-6)
+        # x[1] sits at the bound x[1] <= 6 of the second row
+        np.testing.assert_allclose(report.get('reduced_cost'), [0, 3],
+                                   atol=1e-6)
+
+        # degenerate with several optima: the interior point solution is
+        # replaced by a vertex and the duals are those of its basis
+        constraints = [x[0] + x[1] <= 4, x[0] + x[1] <= 4, x[0] <= 3]
+        prob = cp.Problem(cp.Maximize(x[0] + x[1]), constraints)
+        prob.solve(solver=cp.CLARABEL)
+        report = get_sensitivity_report(prob)
+        self.assertFalse(np.isnan(report.get('rhs_range')).any())
+        self.assertFalse(np.isnan(report.get('objective_range')).any())
+        dual = report.get('dual')
+        np.testing.assert_allclose(sorted(dual[:2]), [0, 1], atol=1e-6)
+        # only the basic copy has a slope, and only up to the other copy
+        np.testing.assert_allclose(
+            report.get('rhs_range')[np.argmax(dual[:2])], [0, 4],
+            atol=1e-6)
+        np.testing.assert_allclose(
+            report.get('rhs_range')[np.argmin(dual[:2])], [4, np.inf],
+            atol=1e-6)
+
+    def test_parameter_grid(self):
+        grid = parameter_grid([1, 2], [[0, 1], [1, 0]])
+        np.testing.assert_array_equal(
+            grid, [[1, 0, 1], [1, 1, 0], [2, 0, 1], [2, 1, 0]])
+
 
 class TestMinimumSpanningTree(unittest.TestCase):
     def test_minimum_spanning_tree(self):
@@ -352,6 +918,522 @@ class TestMinimumSpanningTree(unittest.TestCase):
         self.assertIsNone(
             get_minimum_spanning_tree(Graph()))
 
+        kruskal_tree = get_minimum_spanning_tree(graph, algorithm='kruskal')
+        self.assertEqual(
+            sum(e.length for e in kruskal_tree.edges),
+            sum(e.length for e in tree.edges))
+
+    def test_minimum_spanning_forest(self):
+        edge_list = [
+            Edge('A', 'B', weight=3),
+            Edge('C', 'B', weight=1),
+            Edge('A', 'C', weight=1),
+            Edge('D', 'E', weight=2),
+            Edge('F', 'E', weight=5),
+            Edge('F', 'D', weight=4),
+        ]
+        graph = Graph(edge_list)
+
+        for algorithm in ['prim', 'kruskal']:
+            forest = get_minimum_spanning_tree(
+                graph, key_attr='weight', algorithm=algorithm)
+            self.assertEqual(len(forest.edges), 4)
+            self.assertEqual(sum(e.weight for e in forest.edges), 8)
+            self.assertEqual(len(forest.vertices), 6)
+
+        with self.assertRaises(ValueError):
+            get_minimum_spanning_tree(graph, algorithm='boruvka')
+
+
+class TestAssignment(unittest.TestCase):
+
+    def test_hungarian_method(self):
+        cost = np.array([[4, 1, 3],
+                         [2, 0, 5],
+                         [3, 2, 2]])
+        prob = AssignmentProblem(cost)
+        result = prob.solve()
+        self.assertEqual(result.get('status'), 'optimal')
+        self.assertEqual(result.get('optimal_value'), 5)
+        self.assertEqual(prob.assignment, [1, 0, 2])
+
+        # forbidden entries
+        cost = np.array([[1, np.inf],
+                         [np.inf, 1]])
+        result = hungarian_method(cost)
+        self.assertEqual(result.get('optimal_solution'), [0, 1])
+        self.assertEqual(result.get('optimal_value'), 2)
+
+        cost = np.array([[1, np.inf],
+                         [2, np.inf]])
+        result = hungarian_method(cost)
+        self.assertEqual(result.get('status'), 'infeasible')
+        self.assertIsNone(result.get('optimal_solution'))
+
+        with self.assertRaises(ValueError):
+            hungarian_method(np.array([[1, np.nan]]))
+
+    def test_rectangular(self):
+        cost = np.array([[4, 1, 3, 2],
+                         [2, 0, 5, 3]])
+        result = hungarian_method(cost)
+        self.assertEqual(result.get('optimal_value'), 2)
+        self.assertEqual(result.get('optimal_solution'), [3, 1])
+
+        result = hungarian_method(cost.T)
+        self.assertEqual(result.get('optimal_value'), 2)
+        self.assertEqual(result.get('optimal_solution'), [-1, 1, -1, 0])
+
+    def test_batch(self):
+        rng = np.random.default_rng(0)
+        costs = rng.integers(0, 10, (50, 4, 4)).astype(float)
+        costs[0] = np.inf
+        result = hungarian_method_batch(costs)
+        self.assertEqual(result['optimal_solution'].shape, (50, 4))
+        self.assertEqual(result['status'][0], 'infeasible')
+        for k in range(1, 50):
+            single = hungarian_method(costs[k])
+            self.assertEqual(result['status'][k], 'optimal')
+            self.assertEqual(result['optimal_value'][k],
+                             single.get('optimal_value'))
+            # compare with brute force over all permutations
+            self.assertEqual(
+                single.get('optimal_value'),
+                min(sum(costs[k][i, j] for i, j in enumerate(p))
+                    for p in itertools.permutations(range(4))))
+
+
+class TestTransportation(unittest.TestCase):
+
+    def solve_lp(self, supply, demand, cost):
+        x = cp.Variable(cost.shape, nonneg=True)
+        constraints = [cp.sum(x, axis=1) <= supply,
+                       cp.sum(x, axis=0) >= demand]
+        prob = cp.Problem(cp.Minimize(cp.sum(cp.multiply(cost, x))),
+                          constraints)
+        prob.solve()
+        return prob.value
+
+    def test_transportation_simplex(self):
+        supply = np.array([20, 30, 25])
+        demand = np.array([10, 25, 20, 20])
+        cost = np.array([[8, 6, 10, 9],
+                         [9, 12, 13, 7],
+                         [14, 9, 16, 5]])
+        prob = TransportationProblem(supply, demand, cost)
+        result = prob.solve()
+        self.assertEqual(result.get('status'), 'optimal')
+        self.assertAlmostEqual(result.get('optimal_value'),
+                               self.solve_lp(supply, demand, cost), 4)
+
+        flows = result.get('optimal_solution')
+        np.testing.assert_allclose(flows.sum(axis=0), demand)
+        self.assertTrue(np.all(flows.sum(axis=1) <= supply))
+        self.assertEqual(len(result.get('basis')), 3 + 4 - 1)
+
+        # complementary slackness: basic cells have zero reduced cost
+        reduced = cost - prob.u[:, None] - prob.v[None, :]
+        self.assertTrue(np.all(reduced >= -1e-9))
+        self.assertTrue(np.all(np.abs(reduced[flows > 0]) <= 1e-9))
+
+        # warm start from the previous basis after a cost change
+        prob.cost = cost + np.array([[0, 5, 0, 0],
+                                     [0, 0, 0, 0],
+                                     [0, 0, 0, 3]])
+        result = prob.solve()
+        self.assertAlmostEqual(result.get('optimal_value'),
+                               self.solve_lp(supply, demand, prob.cost), 4)
+
+    def test_unbalanced_and_forbidden(self):
+        cost = np.array([[1, 4],
+                         [3, np.inf]])
+        # short of supply: one unit of demand is unmet
+        result = transportation_simplex(
+            TransportationProblem([2, 3], [4, 2], cost))
+        self.assertEqual(result.get('status'), 'optimal')
+        np.testing.assert_allclose(result.get('optimal_solution'),
+                                   [[1, 1], [3, 0]])
+        self.assertAlmostEqual(result.get('optimal_value'), 14)
+
+        # excess supply with a degenerate start
+        result = transportation_simplex(
+            TransportationProblem([2, 2, 2], [2, 2], np.ones((3, 2))))
+        self.assertAlmostEqual(result.get('optimal_value'), 4)
+
+        result = transportation_simplex(
+            TransportationProblem([1, 3], [1, 3], cost))
+        self.assertEqual(result.get('status'), 'infeasible')
+
+
+class TestMaxFlow(unittest.TestCase):
+
+    def setUp(self):
+        # Seervada park (book section 10.5), max flow 14
+        self.graph = Graph([
+            Edge('O', 'A', capacity=5),
+            Edge('O', 'B', capacity=7),
+            Edge('O', 'C', capacity=4),
+            Edge('A', 'B', capacity=1),
+            Edge('A', 'D', capacity=3),
+            Edge('B', 'C', capacity=2),
+            Edge('B', 'D', capacity=4),
+            Edge('B', 'E', capacity=5),
+            Edge('C', 'E', capacity=4),
+            Edge('D', 'T', capacity=9),
+            Edge('E', 'D', capacity=1),
+            Edge('E', 'T', capacity=6),
+        ])
+
+    def test_max_flow(self):
+        for graph in [self.graph, self.graph.freeze()]:
+            for algorithm in ['dinic', 'push_relabel']:
+                prob = MaxFlowProblem(graph, 'O', 'T', 'capacity',
+                                      algorithm=algorithm)
+                result = prob.solve()
+                self.assertEqual(result.get('status'), 'optimal')
+                self.assertAlmostEqual(prob.value, 14)
+
+                # conservation at the transshipment vertices
+                for name in 'ABCDE':
+                    inflow = sum(f for (u, v), f in prob.flows.items()
+                                 if v == name)
+                    outflow = sum(f for (u, v), f in prob.flows.items()
+                                  if u == name)
+                    self.assertAlmostEqual(inflow, outflow)
+
+                # the cut edges are saturated and add up to the flow value
+                self.assertIn('O', prob.source_side)
+                self.assertNotIn('T', prob.source_side)
+                self.assertAlmostEqual(
+                    sum(self.graph.get_edge(*key).capacity
+                        for key in prob.cut_edges), 14)
+                for key in prob.cut_edges:
+                    self.assertAlmostEqual(
+                        prob.flows[key], self.graph.get_edge(*key).capacity)
+
+        with self.assertRaises(ValueError):
+            get_max_flow(self.graph, 'O', 'T', 'capacity', algorithm='lp')
+
+    def test_uncapacitated(self):
+        # edges without the capacity attribute are uncapacitated
+        self.graph.add_edge(Edge('O', 'F'))
+        self.graph.add_edge(Edge('F', 'T', capacity=3))
+        result = get_max_flow(self.graph, 'O', 'T', 'capacity')
+        self.assertAlmostEqual(result.get('optimal_value'), 17)
+
+        self.graph.update_edge('F', 'T', capacity=np.inf)
+        result = get_max_flow(self.graph, 'O', 'T', 'capacity')
+        self.assertEqual(result.get('status'), 'unbounded')
+        self.assertEqual(result.get('optimal_value'), np.inf)
+
+
+class TestMinCostFlow(unittest.TestCase):
+
+    def setUp(self):
+        # Distribution Unlimited Co. (book section 10.6)
+        self.graph = Graph([
+            Edge('A', 'B', cost=2, capacity=10),
+            Edge('A', 'C', cost=4),
+            Edge('A', 'D', cost=9),
+            Edge('B', 'C', cost=3),
+            Edge('C', 'E', cost=1, capacity=80),
+            Edge('D', 'E', cost=3),
+            Edge('E', 'D', cost=2),
+        ])
+        for name, b in [('A', 50), ('B', 40), ('C', 0), ('D', -30),
+                        ('E', -60)]:
+            self.graph.get_vertex(name).add_attr(b=b)
+
+    def test_min_cost_flow(self):
+        for graph in [self.graph, self.graph.freeze()]:
+            result = get_min_cost_flow(graph, capacity_attr='capacity')
+            self.assertEqual(result.get('status'), 'optimal')
+            self.assertAlmostEqual(result.get('optimal_value'), 490)
+
+            flows = result.get('optimal_solution')
+            self.assertAlmostEqual(flows[('C', 'E')], 80)
+            for vertex in self.graph.vertices:
+                outflow = sum(f for (u, v), f in flows.items()
+                              if u == vertex.name)
+                inflow = sum(f for (u, v), f in flows.items()
+                             if v == vertex.name)
+                self.assertAlmostEqual(outflow - inflow, vertex.b)
+
+            # complementary slackness with the potentials
+            potentials = result.get('potentials')
+            for edge in self.graph.edges:
+                key = (edge.source.name, edge.target.name)
+                reduced = (edge.cost + potentials[key[0]] -
+                           potentials[key[1]])
+                if flows[key] > 0:
+                    self.assertLessEqual(reduced, 1e-9)
+                if flows[key] < edge.attrs.get('capacity', np.inf):
+                    self.assertGreaterEqual(reduced, -1e-9)
+
+    def test_flow_model(self):
+        model = FlowModel(self.graph, capacity_attr='capacity')
+        self.assertEqual(model.incidence.shape, (5, 7))
+        k = model.edge_names.index(('C', 'E'))
+        column = model.incidence[:, k].toarray().ravel()
+        self.assertEqual(column[model.vertex_names.index('C')], 1)
+        self.assertEqual(column[model.vertex_names.index('E')], -1)
+        self.assertEqual(model.capacity[k], 80)
+
+        prob = model.problem()
+        self.assertEqual(len(prob.constraints), 2)
+        prob.solve()
+        self.assertAlmostEqual(prob.value, 490, 4)
+        flows = model.to_edges()
+        self.assertAlmostEqual(flows[('C', 'E')], 80, 4)
+        self.assertEqual(set(flows), set(
+            (e.source.name, e.target.name) for e in self.graph.edges))
+
+    def test_infeasible_and_unbounded(self):
+        self.graph.update_edge('C', 'E', capacity=10)
+        self.graph.update_edge('A', 'D', capacity=10)
+        self.graph.update_edge('B', 'C', capacity=10)
+        result = get_min_cost_flow(self.graph, capacity_attr='capacity')
+        self.assertEqual(result.get('status'), 'infeasible')
+        self.assertIn("['A', 'B', 'C']", result.get('message'))
+
+        self.graph.get_vertex('E').add_attr(b=0)
+        result = get_min_cost_flow(self.graph, capacity_attr='capacity')
+        self.assertEqual(result.get('status'), 'infeasible')
+        self.assertIn('sum to 60', result.get('message'))
+
+        self.setUp()
+        self.graph.update_edge('E', 'D', cost=-5)
+        result = get_min_cost_flow(self.graph, capacity_attr='capacity')
+        self.assertEqual(result.get('status'), 'unbounded')
+
+
+class TestParameterSweep(unittest.TestCase):
+
+    def setUp(self):
+        # economic dispatch of three units to meet the demand D
+        self.c = cp.Parameter(3, value=np.array([1., 2., 3.]))
+        self.D = cp.Parameter(value=10.)
+        self.p = cp.Variable(3)
+        self.prob = cp.Problem(
+            cp.Minimize(self.c @ self.p),
+            [cp.sum(self.p) == self.D, self.p >= 0, self.p <= [5, 6, 8]])
+        self.grid = parameter_grid([5, 12, 20], [[1, 2, 3], [3, 2, 1]])
+
+    def test_sweep(self):
+        result = parameter_sweep(self.prob, [self.D, self.c], self.grid)
+        self.assertEqual(list(result.get('status')),
+                         ['optimal'] * 4 + ['infeasible'] * 2)
+        np.testing.assert_allclose(result.get('optimal_value')[:4],
+                                   [5, 5, 20, 16], atol=1e-5)
+        self.assertTrue(np.isinf(result.get('optimal_value')[4:]).all())
+        np.testing.assert_allclose(result.get('optimal_solution')[2],
+                                   [5, 6, 1], atol=1e-5)
+        self.assertTrue(np.isnan(result.get('optimal_solution')[4:]).all())
+        # the original values are restored
+        self.assertEqual(self.D.value, 10)
+        np.testing.assert_array_equal(self.c.value, [1, 2, 3])
+
+        for row, value in zip(self.grid[:4], result.get('optimal_value')):
+            self.D.value, self.c.value = row[0], row[1:]
+            self.prob.solve()
+            self.assertAlmostEqual(self.prob.value, value, 4)
+
+        with self.assertRaises(ValueError):
+            parameter_sweep(self.prob, [self.D], self.grid)
+
+    def test_parallel_sweep(self):
+        serial = parameter_sweep(self.prob, [self.D], [8, 12, 14, 16])
+        parallel = parameter_sweep(self.prob, [self.D], [8, 12, 14, 16],
+                                   workers=2)
+        np.testing.assert_array_equal(serial.get('status'),
+                                      parallel.get('status'))
+        np.testing.assert_allclose(serial.get('optimal_value'),
+                                   parallel.get('optimal_value'), atol=1e-5)
+        np.testing.assert_allclose(serial.get('optimal_solution'),
+                                   parallel.get('optimal_solution'),
+                                   atol=1e-5)
+
+
+class TestUnitCommitment(unittest.TestCase):
+
+    def setUp(self):
+        # units A, B and C of the unit commitment notebook
+        self.prob = UnitCommitmentProblem(
+            cost=[10, 12, 20], startup_cost=[1000, 600, 100],
+            p_min=[150, 50, 10], p_max=[250, 100, 50],
+            demand=[150, 300, 200], up_time=[3, 2, 1], down_time=[3, 1, 1],
+            initial_state=[1, 0, 0])
+
+    def test_mip(self):
+        result = self.prob.solve()
+        self.assertEqual(result.get('status'), 'optimal')
+        self.assertAlmostEqual(result.get('optimal_value'), 7100, 4)
+        np.testing.assert_allclose(
+            self.prob.u.value, [[1, 1, 1], [0, 0, 0], [0, 1, 0]], atol=1e-6)
+
+    def test_lagrangian(self):
+        result = self.prob.solve(method='lagrangian', max_iterations=50)
+        self.assertEqual(result.get('status'), 'feasible')
+        self.assertLessEqual(result.get('lower_bound'), 7100 + 1e-6)
+        self.assertGreaterEqual(result.get('optimal_value'), 7100)
+        # the schedule is feasible in the MIP
+        self.assertAlmostEqual(self.prob.problem().objective.value,
+                               result.get('optimal_value'))
+        for c in self.prob.problem().constraints:
+            self.assertTrue(c.value(1e-6))
+
+    def test_lagrangian_workers(self):
+        rng = np.random.default_rng(0)
+        p_min = rng.uniform(10, 60, 6)
+        p_max = p_min + rng.uniform(20, 150, 6)
+        args = (rng.uniform(10, 40, 6), rng.uniform(0, 800, 6), p_min,
+                p_max, rng.uniform(0.3, 0.8, 8) * p_max.sum(),
+                rng.integers(1, 4, 6), rng.integers(1, 4, 6),
+                rng.integers(0, 2, 6))
+        mip = UnitCommitmentProblem(*args).solve()
+        serial = UnitCommitmentProblem(*args).solve(
+            method='lagrangian', max_iterations=100)
+        parallel = UnitCommitmentProblem(*args).solve(
+            method='lagrangian', max_iterations=100, workers=2)
+        self.assertLessEqual(serial.get('lower_bound'),
+                             mip.get('optimal_value') + 1e-6)
+        self.assertLessEqual(mip.get('optimal_value'),
+                             serial.get('optimal_value') + 1e-6)
+        self.assertAlmostEqual(serial.get('optimal_value'),
+                               parallel.get('optimal_value'))
+        self.assertAlmostEqual(serial.get('lower_bound'),
+                               parallel.get('lower_bound'))
+
+
+class TestSolveCache(unittest.TestCase):
+
+    def build(self, c=(5, 4, 3)):
+        x = cp.Variable(3, boolean=True)
+        return BinaryIntegerProblem(cp.Maximize(np.array(c) @ x),
+                                    [np.array([2, 3, 1]) @ x <= 4])
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint(self.build()), fingerprint(self.build()))
+        self.assertNotEqual(fingerprint(self.build()),
+                            fingerprint(self.build((5, 4, 2))))
+
+        x = cp.Variable(1)
+        p = cp.Parameter(value=1.)
+        prob = cp.Problem(cp.Minimize(x), [x >= p])
+        before = fingerprint(prob)
+        p.value = 2.
+        self.assertNotEqual(before, fingerprint(prob))
+
+        graph = Graph([Edge('A', 'B', cost=1), Edge('B', 'C', cost=2)])
+        before = fingerprint(graph)
+        self.assertEqual(before, fingerprint(
+            Graph([Edge('A', 'B', cost=1), Edge('B', 'C', cost=2)])))
+        graph.update_edge('A', 'B', cost=3)
+        self.assertNotEqual(before, fingerprint(graph))
+
+        # in place attribute changes bump the version too
+        for change in [lambda: setattr(graph.get_edge('A', 'B'), 'cost', 4),
+                       lambda: graph.get_edge('B', 'C').update(cost=1),
+                       lambda: graph.get_edge('B', 'C').delete_attr('cost'),
+                       lambda: setattr(graph.get_vertex('A'), 'x', 1.)]:
+            before = fingerprint(graph)
+            change()
+            self.assertNotEqual(before, fingerprint(graph))
+
+    def test_call(self):
+        cache = SolveCache(max_size=2)
+        first = cache.call(branch_and_bound, self.build())
+        second = cache.call(branch_and_bound, self.build())
+        self.assertEqual(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        graph = Graph([Edge('A', 'B', cost=1), Edge('B', 'C', cost=2)])
+        self.assertEqual(cache.call(get_shortest_path, graph, 'A', 'C'),
+                         (3, ['A', 'B', 'C']))
+        graph.update_edge('A', 'B', cost=5)
+        self.assertEqual(cache.call(get_shortest_path, graph, 'A', 'C'),
+                         (7, ['A', 'B', 'C']))
+        graph.get_edge('A', 'B').cost = 1
+        self.assertEqual(cache.call(get_shortest_path, graph, 'A', 'C'),
+                         (3, ['A', 'B', 'C']))
+        # the branch and bound result was evicted
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn(SolveCache.key(branch_and_bound, self.build()),
+                         cache)
+
+    def test_disk(self):
+        x = cp.Variable(1, name='x')
+        prob = cp.Problem(cp.Minimize(x), [x >= 2])
+        with tempfile.TemporaryDirectory() as path:
+            result = SolveCache(path=path).solve(prob)
+            self.assertAlmostEqual(result.get('optimal_value'), 2)
+
+            cache = SolveCache(path=path)
+            result['optimal_value'] = None  # results are copies
+            self.assertAlmostEqual(
+                cache.solve(prob).get('optimal_solution').get('x'), 2)
+            self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+
+class TestSolverStats(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = Graph([
+            Edge('O', 'A', cost=2, length=2),
+            Edge('O', 'B', cost=5, length=5),
+            Edge('A', 'B', cost=2, length=2),
+            Edge('B', 'T', cost=1, length=1),
+            Edge('A', 'T', cost=6, length=6)])
+
+    def test_branch_and_bound(self):
+        x = cp.Variable(5, boolean=True)
+        prob = BinaryIntegerProblem(
+            cp.Maximize(np.array([8, 11, 6, 4, 7]) @ x),
+            [np.array([5, 7, 4, 3, 6]) @ x <= 14])
+        events = []
+        stats = SolverStats(callback=lambda event, s: events.append(event))
+        result = branch_and_bound(prob, node_selection='depth_first',
+                                  heuristics=(), cuts=(), stats=stats)
+        counters = stats.counters
+        # pruned nodes are counted whether or not their LP was solved
+        solved = (counters['nodes_branched'] + counters['nodes_integral'] +
+                  counters['nodes_infeasible'])
+        self.assertGreaterEqual(counters['nodes_explored'], solved)
+        self.assertLessEqual(counters['nodes_explored'],
+                             solved + counters['nodes_pruned'])
+        self.assertGreaterEqual(counters['incumbents'], 1)
+        self.assertGreater(stats.max_depth, 0)
+        self.assertLessEqual(stats.times['lp'], stats.times['total'])
+        self.assertGreaterEqual(stats.overhead_time, 0)
+
+        # the incumbent rises and the bound falls to the optimal value
+        incumbents = [row[1] for row in stats.trace]
+        bounds = [row[2] for row in stats.trace]
+        self.assertEqual(incumbents, sorted(incumbents))
+        self.assertEqual(bounds, sorted(bounds, reverse=True))
+        self.assertAlmostEqual(incumbents[-1], result.get('optimal_value'))
+        self.assertAlmostEqual(bounds[-1], result.get('optimal_value'))
+        self.assertEqual(events.count('incumbent'), counters['incumbents'])
+        self.assertEqual(events[-1], 'finish')
+
+    def test_graph_algorithms(self):
+        stats = SolverStats()
+        self.assertEqual(get_shortest_path(self.graph, 'O', 'T',
+                                           stats=stats)[0], 5)
+        self.assertEqual(stats.counters['vertices_settled'], 4)
+        # the pops include the stale entry of B and stop at T, leaving
+        # the entry of A -> T on the heap
+        self.assertEqual(stats.counters['heap_pushes'], 6)
+        self.assertEqual(stats.counters['heap_pops'], 5)
+
+        stats = SolverStats()
+        get_minimum_spanning_tree(self.graph, algorithm='kruskal',
+                                  stats=stats)
+        get_minimum_spanning_tree(self.graph, stats=stats)
+        as_dict = stats.as_dict()
+        self.assertEqual(as_dict.get('edges_relaxed'), 5 + 10)
+        self.assertGreater(as_dict.get('total_time'), 0)
+
 
 if __name__ == '__main__':
 
@@ -1,5 +1,14 @@
 import cvxpy as cp
+import numpy as np
 import pandas as pd
+import scipy.linalg
+import scipy.sparse
+
+import hashlib
+import itertools
+import pickle
+
+from solver.classes import CSRGraph, Graph, LinearRelaxation
 
 
 def is_integer_solution(solution: list, epsilon: float):
@@ -20,6 +29,192 @@ def get_result_summary(prob: cp.problems.problem.Problem):
     return result
 
 
+def _independent_rows(matrix, order, tolerance=1e-9) -> list:
+    """Greedily pick rows of the matrix in the given order that are
+    linearly independent of the rows picked before.
+    """
+    picked = []
+    basis = np.zeros((0, matrix.shape[1]))  # orthonormal picked rows
+    for i in order:
+        row = matrix[i]
+        residual = row - basis.T @ (basis @ row)
+        norm = np.linalg.norm(residual)
+        if norm > tolerance * max(1., np.linalg.norm(row)):
+            picked.append(i)
+            basis = np.vstack([basis, residual / norm])
+            if len(picked) == matrix.shape[1]:
+                break
+    return picked
+
+
+def _ratio_bounds(matrix, slack, tolerance) -> tuple:
+    """Largest steps t_min <= 0 <= t_max per column j such that
+    t * matrix[:, j] <= slack.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = slack[:, None] / matrix
+    upper = np.where(matrix > tolerance, ratios, np.inf).min(
+        axis=0, initial=np.inf)
+    lower = np.where(matrix < -tolerance, ratios, -np.inf).max(
+        axis=0, initial=-np.inf)
+    return lower, upper
+
+
+def _basis_report(prob: cp.problems.problem.Problem, tolerance):
+    """Sensitivity report from an optimal basis at the solution of prob,
+    None if the solution is not a vertex or the basis found is not dual
+    feasible.
+    """
+    relaxation = LinearRelaxation(prob)
+    variables = relaxation.variables
+    n = relaxation.size
+    sense = -1. if isinstance(prob.objective, cp.Maximize) else 1.
+    cost, _ = relaxation.objective_coefficients()
+    x = np.concatenate([np.ravel(v.value, order='C') for v in variables])
+
+    rows = relaxation.constraint_rows()
+    index = np.concatenate([np.full(len(b), i) for i, _, _, b in rows]
+                           + [np.zeros(0, dtype=int)]).astype(int)
+    A = np.vstack([matrix for _, _, matrix, _ in rows] + [np.zeros((0, n))])
+    b = np.concatenate([rhs for _, _, _, rhs in rows] + [np.zeros(0)])
+    eq = np.concatenate([np.full(len(rhs), kind == 'eq')
+                         for _, kind, _, rhs in rows] + [np.zeros(0, bool)])
+    # the solver's duals only rank the candidate rows of the basis
+    solver_duals = np.concatenate(
+        [np.zeros(len(rhs)) if prob.constraints[i].dual_value is None
+         else np.ravel(prob.constraints[i].dual_value, order='F')
+         for i, _, _, rhs in rows] + [np.zeros(0)])
+    m = len(b)
+
+    slack = np.where(eq, 0., b - A @ x)
+    binding = eq | (slack <= tolerance * np.maximum(1., np.abs(b)))
+    # duals of all rows in the minimization sense
+    gradient = sense * cost + A.T @ solver_duals
+
+    # sign constraints of the variables as rows -x_j <= 0 or x_j <= 0
+    signs = np.zeros(n)
+    for v in variables:
+        start = relaxation.offsets[v.id]
+        if v.attributes['nonneg']:
+            signs[start:start + v.size] = -1.
+        elif v.attributes['nonpos']:
+            signs[start:start + v.size] = 1.
+    signed = np.flatnonzero(signs)
+    A_all = np.vstack([A, np.eye(n)[signed] * signs[signed, None]])
+    b_all = np.concatenate([b, np.zeros(len(signed))])
+    eq_all = np.concatenate([eq, np.zeros(len(signed), bool)])
+    slack_all = np.concatenate([slack, -signs[signed] * x[signed]])
+    binding_all = np.concatenate(
+        [binding, np.abs(x[signed]) <= tolerance])
+    solver_duals_all = np.concatenate(
+        [solver_duals, -signs[signed] * gradient[signed]])
+
+    # eq rows first, then binding rows by decreasing dual
+    candidates = np.flatnonzero(binding_all)
+    order = candidates[np.lexsort(
+        (-np.abs(solver_duals_all[candidates]), ~eq_all[candidates]))]
+    basic = _independent_rows(A_all, order)
+    if len(basic) < n:
+        return None  # not a vertex
+
+    inverse = scipy.linalg.inv(A_all[basic])
+    basic = np.array(basic)
+    # the duals of the basis, those of inequality rows must be
+    # non-negative for it to be optimal
+    basic_duals = -inverse.T @ (sense * cost)
+    inequality = ~eq_all[basic]
+    if np.any(basic_duals[inequality] < -tolerance * max(
+            1., np.max(np.abs(basic_duals)))):
+        return None
+    duals_all = np.zeros(len(b_all))
+    duals_all[basic] = basic_duals
+    duals = duals_all[:m]
+    bounds = np.count_nonzero(A, axis=1) == 1
+    reduced_cost = sense * cost + A[~bounds].T @ duals[~bounds]
+
+    nonbasic = np.setdiff1d(np.arange(len(b_all)), basic)
+    # equalities as two inequalities with no slack
+    nonbasic_eq = nonbasic[eq_all[nonbasic]]
+    ratio_rows = np.concatenate([A_all[nonbasic], -A_all[nonbasic_eq]])
+    ratio_slack = np.maximum(np.concatenate(
+        [slack_all[nonbasic], slack_all[nonbasic_eq]]), 0.)
+
+    # moving b_i of a basic row moves x along column i of the inverse
+    rhs_range = np.full((m, 2), np.nan)
+    lower, upper = _ratio_bounds(
+        ratio_rows @ inverse, ratio_slack, tolerance)
+    explicit = basic < m
+    rhs_range[basic[explicit], 0] = b[basic[explicit]] + lower[explicit]
+    rhs_range[basic[explicit], 1] = b[basic[explicit]] + upper[explicit]
+    loose = nonbasic[nonbasic < m]
+    rhs_range[loose, 0] = np.where(eq[loose], b[loose], (A @ x)[loose])
+    rhs_range[loose, 1] = np.where(eq[loose], b[loose], np.inf)
+
+    # moving c_j moves the basic duals -inv.T @ c along -inv[j], the
+    # duals of inequality rows must stay non-negative
+    objective_range = np.full((n, 2), np.nan)
+    lower, upper = _ratio_bounds(
+        inverse.T[inequality], np.maximum(basic_duals[inequality], 0.),
+        tolerance)
+    # c_j + t stays optimal for lower <= t <= upper (minimization)
+    if sense > 0:
+        objective_range[:, 0] = cost + lower
+        objective_range[:, 1] = cost + upper
+    else:
+        objective_range[:, 0] = cost - upper
+        objective_range[:, 1] = cost - lower
+
+    return {'status': prob.status,
+            'optimal_value': prob.value,
+            'reduced_cost': sense * reduced_cost,
+            'objective_range': objective_range,
+            'constraint_index': index,
+            'dual': duals,
+            'slack': slack,
+            'binding': binding,
+            'rhs': b,
+            'rhs_range': rhs_range}
+
+
+def get_sensitivity_report(prob: cp.problems.problem.Problem,
+                           tolerance=1e-6, solver=cp.HIGHS) -> dict:
+    """Sensitivity analysis of a solved LP from its optimal basis.
+
+    Entries are arrays over the flat solution (the entries of
+    prob.variables() in order, each flattened row-major) or over the rows
+    of the affine constraints (each constraint flattened column-major,
+    written as `A @ x <= b` or `A @ x == b`):
+
+    'reduced_cost': c - y @ A over the rows with more than one variable
+        (rows with a single variable are treated as its bounds)
+    'objective_range': (n, 2) interval of each objective coefficient over
+        which the solution stays optimal
+    'constraint_index': position of each row's constraint in prob
+    'dual': the rows' dual values y in the basis, the improvement of the
+        objective per unit increase of b
+    'slack': b - A @ x, and 'binding' the rows with no slack
+    'rhs', 'rhs_range': b and the (m, 2) interval of each b over which the
+        basis stays optimal
+
+    The basis is made of the binding rows, preferring those with non-zero
+    duals, and the sign constraints of nonneg and nonpos variables. If
+    the solution has no optimal basis (e.g. an interior point solution of
+    an LP with several optima), prob is solved again with `solver`, a
+    simplex or crossover method such as HIGHS, and a ValueError is raised
+    if that does not help either.
+    """
+    if prob.status != 'optimal':
+        raise ValueError('The problem is not solved to optimality.')
+    report = _basis_report(prob, tolerance)
+    if report is None and solver is not None:
+        prob.solve(solver=solver)
+        report = _basis_report(prob, tolerance)
+    if report is None:
+        raise ValueError('The solution is not an optimal vertex, solve the '
+                         'problem with a simplex method such as HIGHS.')
+    return report
+
+
 def prettify(d: dict):
     variable = []
     value = []
@@ -42,3 +237,127 @@ def get_variable(prob: cp.problems.problem.Problem, name: str):
         if v.name() == name:
             return v
     return None
+
+
+def parameter_grid(*axes):
+    """Cartesian product of per parameter value lists as a (k, n) array,
+    the last axis varying fastest. Array valued axes contribute all their
+    entries to each row, so an axis may list whole parameter vectors.
+    """
+    axes = [np.asarray(axis, dtype=float) for axis in axes]
+    axes = [axis.reshape(len(axis), -1) for axis in axes]
+    rows = [np.concatenate(combination)
+            for combination in itertools.product(*axes)]
+    return np.array(rows).reshape(len(rows), sum(a.shape[1] for a in axes))
+
+
+def _hash_data(h, data):
+    """Feed plain data (numbers, strings, arrays, containers) to a hash."""
+    if data is None or isinstance(data, (bool, int, float, str, bytes,
+                                         slice, np.generic)):
+        h.update(repr((type(data).__name__, data)).encode())
+    elif isinstance(data, np.ndarray):
+        h.update(repr(('ndarray', data.dtype.str, data.shape)).encode())
+        h.update(np.ascontiguousarray(data).tobytes())
+    elif scipy.sparse.issparse(data):
+        data = scipy.sparse.csr_matrix(data)
+        data.sort_indices()
+        h.update(repr(('sparse', data.shape)).encode())
+        for arr in (data.data, data.indices, data.indptr):
+            _hash_data(h, arr)
+    elif isinstance(data, (tuple, list)):
+        h.update(repr((type(data).__name__, len(data))).encode())
+        for item in data:
+            _hash_data(h, item)
+    elif isinstance(data, dict):
+        h.update(repr(('dict', len(data))).encode())
+        for key in sorted(data, key=repr):
+            _hash_data(h, key)
+            _hash_data(h, data[key])
+    else:
+        h.update(pickle.dumps(data))
+
+
+def _leaf_data(leaf, default_name) -> list:
+    """Shape, set attributes and the name unless cvxpy made it up."""
+    attributes = dict((k, v) for k, v in leaf.attributes.items()
+                      if v is not None and v is not False)
+    name = leaf.name()
+    return [leaf.shape, attributes,
+            None if name == default_name.format(leaf.id) else name]
+
+
+def _hash_graph(h, graph):
+    if isinstance(graph, Graph):
+        # the digest of a Graph is kept until its version changes
+        if graph._fingerprint is None or \
+                graph._fingerprint[0] != graph.version:
+            graph._fingerprint = (graph.version,
+                                  fingerprint(graph.freeze()))
+        h.update(graph._fingerprint[1].encode())
+        return
+    _hash_data(h, ['CSRGraph', graph.names, graph.sources, graph.targets,
+                   graph.edge_attrs, graph.vertex_attrs])
+
+
+def _hash_expression(h, expr, variables):
+    if isinstance(expr, cp.Variable):
+        # variables are numbered by first appearance instead of by id
+        index = variables.setdefault(expr.id, len(variables))
+        _hash_data(h, ['Variable', index] + _leaf_data(expr, 'var{}'))
+    elif isinstance(expr, cp.Parameter):
+        _hash_data(h, ['Parameter', expr.value] +
+                   _leaf_data(expr, 'param{}'))
+    elif isinstance(expr, cp.Constant):
+        _hash_data(h, ['Constant', expr.value])
+    else:
+        data = expr.get_data() if hasattr(expr, 'get_data') else None
+        _hash_data(h, [type(expr).__name__, expr.shape, data,
+                       len(expr.args)])
+        for arg in expr.args:
+            _hash_expression(h, arg, variables)
+
+
+def fingerprint(obj) -> str:
+    """Content hash of a problem or other solver input.
+
+    cvxpy problems are hashed from their objective and constraints, with
+    the variables numbered in order of appearance and the current
+    parameter values, so problems rebuilt from the same data match.
+    Graphs are hashed from their CSR arrays (names, endpoints and numeric
+    attributes), the digest of a Graph being reused until its version
+    changes. Containers are hashed item by item and other objects through
+    pickle.
+    """
+    h = hashlib.sha256()
+    variables = {}
+
+    def update(obj):
+        if isinstance(obj, cp.problems.problem.Problem):
+            _hash_data(h, [type(obj).__name__, len(obj.constraints)])
+            update(obj.objective)
+            for c in obj.constraints:
+                update(c)
+        elif isinstance(obj, (cp.Minimize, cp.Maximize,
+                              cp.constraints.constraint.Constraint)):
+            _hash_data(h, [type(obj).__name__, len(obj.args)])
+            for arg in obj.args:
+                _hash_expression(h, arg, variables)
+        elif isinstance(obj, cp.expressions.expression.Expression):
+            _hash_expression(h, obj, variables)
+        elif isinstance(obj, (Graph, CSRGraph)):
+            _hash_graph(h, obj)
+        elif isinstance(obj, (tuple, list)):
+            _hash_data(h, (type(obj).__name__, len(obj)))
+            for item in obj:
+                update(item)
+        elif isinstance(obj, dict):
+            _hash_data(h, ('dict', len(obj)))
+            for key in sorted(obj, key=repr):
+                _hash_data(h, key)
+                update(obj[key])
+        else:
+            _hash_data(h, obj)
+
+    update(obj)
+    return h.hexdigest()